@@ -31,44 +31,41 @@ pprint(r.json())
 
 import requests  # Para hacer solicitudes HTTP
 import pandas as pd  # Para manejar datos en estructura de DataFrame
+from concurrent.futures import ThreadPoolExecutor  # Para hacer solicitudes en paralelo
+from itertools import islice  # Para recorrer iterables por tandas
+from http_cache import ResponseCache  # Cache de respuestas HTTP en disco
+from pipeline_common import get_data, iter_pages  # GET con métricas y recorrido de endpoints paginados
 from datetime import datetime, timedelta  # Para manipulación de fechas
 from pprint import pprint  # Para imprimir JSON de manera legible
+from luchtmeetnet_backfill import backfill_measurements  # Histórico de mediciones en Delta
 
-# 🔹 Función para obtener datos desde una API
-def get_data(base_url, endpoint, data_field=None, params=None, headers=None):
+# 🔹 Función para obtener el detalle de muchas estaciones en paralelo
+def fetch_station_details(base_url, numbers, max_workers=8, session=None, cache=None):
     """
-    Realiza una solicitud GET a una API para obtener datos en formato JSON.
+    Obtiene el detalle de cada estación con un número acotado de solicitudes en paralelo.
 
     Parámetros:
     - base_url (str): URL base de la API.
-    - endpoint (str): Endpoint específico dentro de la API.
-    - data_field (str, opcional): Clave del JSON que contiene los datos deseados.
-    - params (dict, opcional): Parámetros de consulta (ejemplo: filtros o paginación).
-    - headers (dict, opcional): Encabezados HTTP (ejemplo: autenticación con tokens).
+    - numbers (iterable): Números de estación.
+    - max_workers (int): Cantidad máxima de solicitudes simultáneas.
+    - session (requests.Session, opcional): Sesión keep-alive a reutilizar.
+    - cache (ResponseCache, opcional): Cache en disco para el detalle de las estaciones.
 
     Retorna:
-    - dict o list: Datos obtenidos de la API o None si hay un error.
+    - generator: Páginas (listas) con el detalle de cada estación, en el orden de `numbers`.
     """
-    try:
-        # Construcción de la URL completa
-        url = f"{base_url}/{endpoint}"
-        
-        # Realiza la solicitud GET a la API
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()  # Lanza un error si hay problemas en la respuesta HTTP
-        
-        # Intenta convertir la respuesta a JSON
-        data = response.json()
-        
-        # Si se especificó un campo, devuelve solo esa parte del JSON; si no, todo el JSON
-        return data.get(data_field, data) if data_field else data
-
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error en la solicitud: {e}")
-        return None
-    except ValueError:
-        print("❌ Error al procesar la respuesta JSON")
-        return None
+    def fetch_station(number):
+        station_details = get_data(base_url, f"stations/{number}", data_field="data", session=session, cache=cache)
+        if station_details:
+            station_details["number"] = number  # Agregar número de estación
+        return station_details
+
+    numbers = iter(numbers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while batch := list(islice(numbers, max_workers)):
+            page = [details for details in executor.map(fetch_station, batch) if details]
+            if page:
+                yield page
 
 
 # 🔹 Función para convertir JSON en DataFrame de pandas
@@ -77,11 +74,24 @@ def build_table(json_data):
     Convierte datos JSON en un DataFrame de pandas.
 
     Parámetros:
-    - json_data (dict o list): Datos en formato JSON obtenidos de la API.
+    - json_data (dict, list o iterable de páginas): Datos en formato JSON obtenidos de la API.
+      Si es un iterador (por ejemplo el de `iter_pages`), cada página se normaliza a
+      medida que llega y luego se concatenan los DataFrames.
 
     Retorna:
     - pd.DataFrame: DataFrame con los datos o None si hay error.
     """
+    if json_data is not None and not isinstance(json_data, (dict, list)):
+        try:
+            frames = [pd.json_normalize(page) for page in json_data if page]
+        except Exception as e:
+            print(f"❌ Error al convertir JSON en DataFrame: {e}")
+            return None
+        if not frames:
+            print("⚠️ No se proporcionaron datos válidos")
+            return None
+        return pd.concat(frames, ignore_index=True)
+
     if not json_data:  # Verifica si los datos son válidos
         print("⚠️ No se proporcionaron datos válidos")
         return None
@@ -95,6 +105,11 @@ def build_table(json_data):
 
 # 🔹 Configuración de la API
 base_url = "https://api.luchtmeetnet.nl/open_api"
+max_workers = 8  # Solicitudes simultáneas contra la API
+session = requests.Session()  # Conexión keep-alive compartida por todas las solicitudes
+session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+http_cache = ResponseCache("data/cache/http")  # Respuestas guardadas en disco (1 día de validez)
+BACKFILL_DAYS = 2  # Días de historia que se mantienen cargados en la tabla Delta de mediciones
 
 # 1️⃣ Obtener lista de estaciones
 endpoint = "stations"
@@ -108,33 +123,26 @@ print(f"Tipo de json_data: {type(json_data)}, Tipo de un elemento: {type(json_da
 
 # Obtener componentes medidos en las estaciones
 endpoint = "components"
-json_data = get_data(base_url, endpoint, data_field="data")
+json_data = get_data(base_url, endpoint, data_field="data", cache=http_cache)
 df_components = build_table(json_data)
 
 # Mostrar primeras filas de componentes
 print(df_components.head())
 
 
-# 2️⃣ Obtener todas las estaciones con un parámetro de filtro
+# 2️⃣ Obtener todas las estaciones (todas las páginas) con un parámetro de filtro
 params = {"organisation_id": "1"}
-stations = get_data(base_url, "stations", "data", params=params)
+df_stations = build_table(
+    iter_pages(base_url, "stations", params=params, max_workers=max_workers, session=session, cache=http_cache)
+)
 
-if stations:
-    df_stations = build_table(stations)
+if df_stations is not None:
     print(df_stations.head())  # Muestra primeras filas de las estaciones
 
-# 3️⃣ Obtener detalles de cada estación
-all_stations = []
-
-for station in stations:
-    endpoint = f"stations/{station['number']}"
-    station_details = get_data(base_url, endpoint, data_field="data")
-
-    if station_details:
-        station_details["number"] = station["number"]  # Agregar número de estación
-        all_stations.append(station_details)
-
-df_station_details = build_table(all_stations)
+# 3️⃣ Obtener detalles de cada estación (en paralelo, con un máximo de solicitudes simultáneas)
+df_station_details = build_table(
+    fetch_station_details(base_url, df_stations["number"], max_workers=max_workers, session=session, cache=http_cache)
+)
 print(df_station_details.head())
 
 
@@ -148,8 +156,19 @@ params = {
     "end": start_time.strftime("%Y-%m-%dT%H:59:59Z")
 }
 
-# Obtener mediciones
-measurements = get_data(base_url, "measurements", "data", params=params)
-df_measurements = build_table(measurements)
+# Obtener mediciones (todas las páginas)
+df_measurements = build_table(iter_pages(base_url, "measurements", params=params, max_workers=max_workers, session=session))
 
 print(df_measurements.head())  # Muestra las primeras filas de mediciones
+
+# 5️⃣ Histórico de mediciones en Delta: cada estación sigue desde su marca de agua, así que cada
+# ejecución solo pide las horas nuevas. Como en 4️⃣, no se piden las últimas horas (PUBLICATION_LAG),
+# que la API todavía no publicó. Para cargar un año completo de toda la red:
+#   python luchtmeetnet_backfill.py 2024-01-01 --end 2025-01-01
+backfill_stats = backfill_measurements(
+    current_time - timedelta(days=BACKFILL_DAYS), stations=df_stations["number"], base_url=base_url,
+    max_workers=max_workers,
+)
+
+# Aciertos y fallos del cache HTTP en esta ejecución
+print(f"Cache HTTP: {http_cache.stats()}")
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from dtype_optimizer import optimize_dtypes, memory_summary
+
 # Cargamos el archivo Excel desde una URL en un DataFrame de pandas
 # En este caso, es un dataset público de títulos de Netflix
 # Nota: Se requiere conexión a Internet para que esta línea funcione correctamente
@@ -52,19 +54,15 @@ print("Valores únicos en 'type':", df["type"].unique())
 # Exploramos los valores únicos en la columna 'rating'
 print("Valores únicos en 'rating':", df["rating"].unique())
 
-# Diccionario para convertir los tipos de datos a tipos más eficientes y apropiados
-conversion_mapping = {
-    "duration_minutes": "int8",  # Reducimos el uso de memoria usando un entero pequeño
-    "duration_seasons": "int8",  # Lo mismo para la cantidad de temporadas
-    "date_added": "datetime64[ns]",  # Convertimos a tipo fecha
-    "release_year": "int16",  # Entero de 16 bits suficiente para almacenar años
-    "type": "category",  # Optimizamos 'type' como categoría (Menos espacio en memoria)
-    "rating": "category",  # Lo mismo para 'rating'
-    "title": "string"  # Convertimos los títulos a formato de cadena optimizado
-}
+# Convertimos los tipos de datos a tipos más eficientes con el optimizador: perfila cada columna
+# (rango, cardinalidad y nulos) y elige el entero más chico que la contiene, category o string de Arrow.
+# Antes se usaba int8 a mano para 'duration_minutes', que desborda en silencio con películas de más de
+# 127 minutos; el optimizador elige int16 y rechaza (LossyCastError) cualquier conversión que cambie valores
+df, dtype_report = optimize_dtypes(df, dtypes={"date_added": "datetime64[ns]"})  # La fecha se pide explícitamente
 
-# Aplicamos la conversión de tipos al DataFrame
-df = df.astype(conversion_mapping)
+# Reporte de la optimización: tipo anterior y nuevo, perfil y memoria de cada columna
+print(dtype_report)
+print(memory_summary(dtype_report))
 
 # Inspeccionamos la memoria nuevamente después de la conversión de tipos
 df.info(memory_usage='deep')
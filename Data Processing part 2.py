@@ -1,5 +1,7 @@
 import pandas as pd
 
+from dedup import deduplicate, benchmark_deduplicate
+
 # Creamos un DataFrame con información sobre diferentes marcas de cerveza
 df = pd.DataFrame(
     {
@@ -64,3 +66,12 @@ df_deduplicated = (
     .sort_values(by=["ID", "Date_price"], ascending=[False, False])
     .drop_duplicates(subset=["ID"], keep="first")
 )
+
+# Lo mismo sin ordenar la tabla: `deduplicate` se queda con el precio más reciente de cada 'ID'
+# en una sola pasada de hash (ante un empate de fechas gana la última fila), así que escala
+# linealmente con la cantidad de filas en lugar de pagar el orden O(n log n) de sort_values
+df_deduplicated = deduplicate(df, "ID", keep="latest", by="Date_price")
+print(df_deduplicated)
+
+# Comparamos ambos enfoques con 10 millones de filas (orden + drop_duplicates, hash y hash por lotes)
+print(benchmark_deduplicate(rows=10_000_000).to_string(index=False))
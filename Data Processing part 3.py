@@ -1,22 +1,7 @@
 import pandas as pd
-from faker import Faker
-
-# Función para generar un DataFrame ficticio con logs de servidor
-def generate_fake_logs(n):
-    fake = Faker()
-    logs = []
-    for _ in range(n):
-        ip = fake.ipv4()  # Generamos una dirección IP
-        tstamp = fake.date_time_this_year().strftime("%Y-%m-%d %H:%M:%S")  # Generamos un timestamp formateado
-        method = fake.random_element(["GET", "POST", "PUT", "DELETE"])  # Seleccionamos un método HTTP aleatorio
-        url = fake.uri()  # Generamos una URL aleatoria
-        request = f"{method} {url}"  # Construimos la petición HTTP
-        status = fake.random_int(100, 599)  # Generamos un código de estado HTTP aleatorio
-        bytes_transmitted = fake.random_int(100, 10000)  # Simulamos la cantidad de bytes transmitidos
-        user_agent = fake.user_agent()  # Generamos un user agent aleatorio
-        logs.append(f'{ip} - {tstamp} - "{request}" - {status} - {bytes_transmitted} - "{user_agent}"')
-
-    return pd.DataFrame(logs, columns=["log"])
+
+from log_parser import parse_log_lines, benchmark_log_parser
+from synthetic_data import generate_fake_logs  # Genera columnas completas con una semilla fija, sin Faker por fila
 
 # Generamos 1000 logs ficticios
 df = generate_fake_logs(1000)
@@ -49,4 +34,13 @@ df_structured[["metodo", "url"]] = (
     .str.strip('"')  # Eliminamos las comillas que envuelven la petición
     .str.split(" ", expand=True, n=1)  # Separamos método y URL en dos columnas
 )
-print(df_structured.head())
\ No newline at end of file
+print(df_structured.head())
+
+# Parser tipado y vectorizado: valida cada línea con un regex y separa los campos con kernels de Arrow,
+# sin objetos de Python por fila. El user agent puede contener " - " sin desplazar las columnas
+df_typed = parse_log_lines(df["log"]).to_pandas()
+print(df_typed.dtypes)  # IP uint32, fecha datetime64, estado int16, bytes int32, método category
+df_typed.info(memory_usage="deep")
+
+# Comparamos ambos parsers sobre más volumen
+print(benchmark_log_parser(generate_fake_logs(500_000)["log"]))
@@ -173,4 +173,7 @@ write_deltalake(
 
 os.listdir("data/clients_partitioned")
 
-dt = DeltaTable("data/clients_merge").optimize
+# Compactamos los archivos pequeños de la tabla y mostramos cuántos se reescribieron.
+# Para las tablas de crímenes, ver el comando `python crimes_maintenance.py`.
+dt = DeltaTable("data/clients_merge")
+print(dt.optimize.compact())
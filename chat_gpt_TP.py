@@ -1,3 +1,7 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import pandas as pd
 from deltalake import write_deltalake, DeltaTable
@@ -8,30 +12,62 @@ ENDPOINT_CRIMES_STREET = "crimes-street/all-crime"  # Endpoint para obtener crí
 ENDPOINT_CATEGORIES = "crime-categories"  # Endpoint para obtener categorías de crimen
 MONTHS = ["2024-01", "2024-02", "2024-03"]  # Lista de meses para los que vamos a extraer datos
 AREA_POLY = "52.268,0.543:52.794,0.238:52.130,0.478"  # Área geográfica para los datos de crímenes
+MAX_WORKERS = 4  # Cantidad de meses que se piden en paralelo (1 = secuencial)
+MAX_RPS = 15  # Tope de solicitudes por segundo que permite police.uk
 
 # Rutas donde se almacenarán las tablas Delta para diferentes etapas del proceso
 BRONZE_PATH = "data/bronze/crimes"  # Capa Bronze: Datos crudos sin procesar
 SILVER_PATH = "data/silver/crimes"  # Capa Silver: Datos procesados y limpios
 
 # Función para obtener datos de la API
-def get_data(endpoint, params=None):
+def get_data(endpoint, params=None, session=None):
     """Realiza una solicitud GET a la API y devuelve los datos en formato JSON."""
     try:
-        # Realiza una solicitud GET al endpoint de la API
-        response = requests.get(f"{BASE_URL}/{endpoint}", params=params)
+        # Realiza una solicitud GET al endpoint de la API, reutilizando la sesión si se pasa una
+        response = (session or requests).get(f"{BASE_URL}/{endpoint}", params=params)
         response.raise_for_status()  # Lanza un error si la respuesta no es exitosa
         return response.json()  # Devuelve los datos en formato JSON
     except requests.RequestException as e:
         print(f"Error en la solicitud: {e}")  # Si ocurre un error en la solicitud, lo muestra
         return []  # Devuelve una lista vacía en caso de error
 
+# Función que limita la cantidad de solicitudes por segundo (segura entre hilos)
+def rate_limiter(max_rps):
+    """Devuelve una función que espera lo necesario para no superar `max_rps` solicitudes por segundo."""
+    lock = threading.Lock()
+    interval = 1.0 / max_rps if max_rps else 0.0
+    next_slot = [time.monotonic()]
+
+    def wait():
+        with lock:
+            now = time.monotonic()
+            slot = max(next_slot[0], now)
+            next_slot[0] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    return wait
+
 # Función para obtener los datos de crímenes por calle
-def fetch_crime_data():
-    """Obtiene datos de crímenes para múltiples meses."""
+def fetch_crime_data(max_workers=MAX_WORKERS, max_rps=MAX_RPS):
+    """Obtiene datos de crímenes para múltiples meses, en paralelo y con una sola sesión keep-alive."""
+    wait = rate_limiter(max_rps)
+
+    with requests.Session() as session:
+        # El pool de conexiones de la sesión debe alcanzar para todos los hilos
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+
+        def fetch_month(month):
+            wait()
+            return get_data(ENDPOINT_CRIMES_STREET, {"date": month, "poly": AREA_POLY}, session=session)
+
+        # executor.map conserva el orden de MONTHS, así el resultado es igual al secuencial
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch_month, MONTHS))
+
     # Combina los datos de crímenes para cada mes en un solo DataFrame
-    return pd.DataFrame(
-        [crime for month in MONTHS for crime in get_data(ENDPOINT_CRIMES_STREET, {"date": month, "poly": AREA_POLY})]
-    )
+    return pd.DataFrame([crime for data in results for crime in data])
 
 # Función para obtener las categorías de crímenes
 def fetch_crime_categories():
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import ezequiel_nunzio_TP1 as pipeline
+from crimes_maintenance import count_parquet_files
+from profiling import measure
+from synthetic_data import CRIME_CATEGORIES, CRIME_MONTHS, SEED, fake_crimes
+
+
+# Cantidades de crímenes sintéticos a medir por defecto
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+# Demora artificial de cada respuesta del servidor local (segundos), para simular la red
+LATENCY = 0.05
+# Archivo JSON-lines al que se agregan los resultados de cada corrida
+OUTPUT_PATH = "data/benchmarks/crimes_pipeline.jsonl"
+# Como police.uk, el servidor responde 503 si el polígono pedido contiene más crímenes que esto
+MAX_CRIMES_PER_REQUEST = 10_000
+
+
+def points_in_poly(lat, lng, points):
+    """
+    Indica qué puntos caen dentro de un polígono (regla par-impar), de forma vectorizada.
+
+    Parámetros:
+    - lat, lng (np.ndarray): Coordenadas de los puntos.
+    - points (list): Vértices (lat, lng) del polígono.
+
+    Retorna:
+    - np.ndarray de bool.
+    """
+    inside = np.zeros(len(lat), dtype=bool)
+    for (lat1, lng1), (lat2, lng2) in zip(points, points[1:] + points[:1]):
+        crosses = (lat1 > lat) != (lat2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            at = lng1 + (lat - lat1) * (lng2 - lng1) / (lat2 - lat1)
+        inside ^= crosses & (lng < at)
+    return inside
+
+
+def coordinates(crimes):
+    """
+    Latitud y longitud (np.ndarray de float) de una tabla de crímenes con el esquema de Bronze.
+    """
+    location = crimes["location"]
+    return tuple(
+        pc.cast(pc.struct_field(location, name), pa.float64()).to_numpy() for name in ("latitude", "longitude")
+    )
+
+
+def crimes_json(crimes):
+    """
+    Cuerpo JSON de una respuesta de crimes-street (lista de crímenes) para una tabla con el
+    esquema de Bronze, armado columna por columna con Arrow.
+
+    Los textos de `synthetic_data` no tienen comillas ni barras invertidas, así que no hace falta escaparlos.
+
+    Retorna:
+    - bytes
+    """
+    if crimes.num_rows == 0:
+        return b"[]"
+    location, outcome = crimes["location"], crimes["outcome_status"]
+    street = pc.struct_field(location, "street")
+    outcome_status = pc.fill_null(pc.binary_join_element_wise(
+        '{"category":"', pc.struct_field(outcome, "category"), '","date":"', pc.struct_field(outcome, "date"), '"}', "",
+    ), "null")
+    objects = pc.binary_join_element_wise(
+        '{"category":"', crimes["category"], '","location_type":"', crimes["location_type"],
+        '","location":{"latitude":"', pc.struct_field(location, "latitude"),
+        '","street":{"id":', pc.cast(pc.struct_field(street, "id"), pa.string()),
+        ',"name":"', pc.struct_field(street, "name"), '"},"longitude":"', pc.struct_field(location, "longitude"),
+        '"},"context":"', crimes["context"], '","outcome_status":', outcome_status,
+        ',"persistent_id":"', crimes["persistent_id"], '","id":', pc.cast(crimes["id"], pa.string()),
+        ',"location_subtype":"', crimes["location_subtype"], '","month":"', crimes["month"], '"},', "",
+    ).combine_chunks()
+    # Los objetos terminan en "," y están uno detrás de otro en el buffer de datos del array
+    offsets = np.frombuffer(objects.buffers()[1], np.int32, len(objects) + 1, objects.offset * 4)
+    return b"[" + memoryview(objects.buffers()[2])[offsets[0]:offsets[-1] - 1].tobytes() + b"]"
+
+
+class SyntheticCrimes:
+    """
+    Crímenes sintéticos de `synthetic_data.fake_crimes` servidos como las respuestas de
+    crimes-street de police.uk.
+
+    Se generan lotes (con semilla) hasta juntar `size` crímenes dentro de `area_poly`. Cada
+    mes se guarda como tabla Arrow ordenada por latitud; el JSON de cada respuesta se arma
+    solo para los crímenes del polígono pedido, así el servidor no necesita tener todas las
+    respuestas en memoria.
+    """
+
+    def __init__(self, size, months=CRIME_MONTHS, area_poly=pipeline.AREA_POLY, seed=SEED):
+        points = pipeline.parse_poly(area_poly)
+        parts, found, generated, chunk = [], 0, 0, 0
+        while found < size or not parts:
+            rows = 2 * (size - found)
+            crimes = fake_crimes(rows, seed, chunk, months, first_id=generated)
+            crimes = crimes.filter(pa.array(points_in_poly(*coordinates(crimes), points)))
+            parts.append(crimes)
+            found += crimes.num_rows
+            generated += rows
+            chunk += 1
+        crimes = pa.concat_tables(parts).slice(0, size)
+
+        self.months = {}
+        for month in months:
+            table = crimes.filter(pc.equal(crimes["month"], month))
+            lat, lng = coordinates(table)
+            order = np.argsort(lat, kind="stable")
+            self.months[month] = {"crimes": table.take(order), "lat": lat[order], "lng": lng[order]}
+
+    def select(self, month, poly):
+        """
+        Índices de los crímenes de `month` dentro del polígono `poly` (formato police.uk).
+        """
+        data = self.months.get(month)
+        if data is None:
+            return np.empty(0, dtype=np.int64)
+        points = pipeline.parse_poly(poly)
+        lats = [p[0] for p in points]
+        lngs = [p[1] for p in points]
+        start, end = np.searchsorted(data["lat"], [min(lats), max(lats)], side="left")
+        lng = data["lng"][start:end]
+        candidates = np.flatnonzero((lng >= min(lngs)) & (lng <= max(lngs))) + start
+        inside = points_in_poly(data["lat"][candidates], data["lng"][candidates], points)
+        return candidates[inside]
+
+    def render(self, month, indices):
+        """
+        Arma el cuerpo JSON (bytes) de la respuesta con los crímenes `indices` de `month`. Un mes
+        sin datos sintéticos responde una lista vacía, como police.uk.
+        """
+        data = self.months.get(month)
+        if data is None:
+            return b"[]"
+        return crimes_json(data["crimes"].take(pa.array(indices, pa.int64())))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    Responde como police.uk los endpoints crimes-street/all-crime y crime-categories.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+
+        if url.path.endswith(f"/{pipeline.ENDPOINT_CATEGORIES}"):
+            body = json.dumps([
+                {"url": name, "name": name.replace("-", " ").capitalize()} for name in CRIME_CATEGORIES
+            ]).encode("utf-8")
+        elif url.path.endswith(f"/{pipeline.ENDPOINT_CRIMES_STREET}"):
+            indices = self.server.crimes.select(params.get("date"), params["poly"])
+            if len(indices) > MAX_CRIMES_PER_REQUEST:
+                self.send_response(pipeline.STATUS_AREA_TOO_LARGE)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = self.server.crimes.render(params.get("date"), indices)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def stand_in_server(crimes, latency=LATENCY):
+    """
+    Levanta el servidor local en un puerto libre mientras dura el bloque.
+
+    Retorna (en el `with`):
+    - tuple: (URL base equivalente a pipeline.BASE_URL, servidor; `servidor.requests` cuenta las solicitudes).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.crimes = crimes
+    server.latency = latency
+    server.requests = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/api", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def stage_record(size, stage, stats, rows, files_written=None, **extra):
+    """
+    Arma el registro de una etapa con las métricas comunes a todas.
+    """
+    return {
+        "size": size,
+        "stage": stage,
+        "seconds": stats["seconds"],
+        "rows": rows,
+        "rows_per_s": round(rows / stats["seconds"]) if stats["seconds"] else None,
+        "peak_rss_mb": stats["peak_rss_mb"],
+        "peak_rss_delta_mb": stats["peak_rss_delta_mb"],
+        "files_written": files_written,
+        **extra,
+    }
+
+
+def run_benchmark(size, latency=LATENCY, workers=pipeline.MAX_WORKERS, engine=pipeline.SILVER_ENGINE, seed=SEED):
+    """
+    Corre extracción, Bronze, Silver y Gold para `size` crímenes sintéticos contra el
+    servidor local, con las funciones del pipeline y en un directorio temporal.
+
+    Parámetros:
+    - size (int): Cantidad de crímenes sintéticos.
+    - latency (float): Demora de cada respuesta del servidor, en segundos.
+    - workers (int): Solicitudes en paralelo de `fetch_crime_data`.
+    - engine (str): "arrow", "pandas" o "streaming" para construir Silver.
+
+    Retorna:
+    - list: Un registro (dict) por etapa.
+    """
+    crimes = SyntheticCrimes(size, seed=seed)
+    records = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, stand_in_server(crimes, latency) as (base_url, server):
+        # Las rutas de las tablas del pipeline son relativas: se resuelven dentro del directorio temporal
+        os.chdir(workdir)
+        try:
+            with measure() as stats:
+                raw = pipeline.fetch_crime_data(base_url, pipeline.ENDPOINT_CRIMES_STREET, CRIME_MONTHS,
+                                                pipeline.AREA_POLY, max_workers=workers, max_rps=None)
+                categories = pipeline.fetch_crime_categories(base_url, pipeline.ENDPOINT_CATEGORIES, CRIME_MONTHS)
+            records.append(stage_record(size, "fetch", stats, len(raw), expected_rows=size,
+                                        http_requests=server.requests, latency=latency, workers=workers))
+
+            with measure() as stats:
+                pipeline.write_bronze(raw)
+            records.append(stage_record(size, "bronze", stats, len(raw), count_parquet_files(pipeline.BRONZE_PATH)))
+            del raw
+
+            with measure() as stats:
+                if engine == "streaming":
+                    silver = pipeline.process_crime_data_streaming(categories)
+                else:
+                    silver = pipeline.build_silver(categories, engine=engine)
+            records.append(stage_record(size, "silver", stats, silver["rows"],
+                                        count_parquet_files(pipeline.SILVER_PATH), engine=engine))
+
+            with measure() as stats:
+                gold = pipeline.update_gold()
+            # Para Gold el caudal se mide sobre las filas de Silver que agrega
+            records.append(stage_record(size, "gold", stats, silver["rows"], count_parquet_files(pipeline.GOLD_PATH),
+                                        gold_rows=sum(gold["rows"].values())))
+        finally:
+            os.chdir(cwd)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de punta a punta del pipeline de crímenes contra una API local sintética."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Cantidades de crímenes a medir.")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="Demora de cada respuesta, en segundos.")
+    parser.add_argument("--workers", type=int, default=pipeline.MAX_WORKERS, help="Solicitudes en paralelo.")
+    parser.add_argument("--engine", choices=["arrow", "pandas", "streaming"], default=pipeline.SILVER_ENGINE,
+                        help="Motor para construir Silver.")
+    parser.add_argument("--seed", type=int, default=SEED, help="Semilla de los datos sintéticos.")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Archivo JSON-lines donde agregar los resultados.")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    started_at = pd.Timestamp.now(tz="UTC").isoformat()
+    results = []
+    for size in args.sizes:
+        records = run_benchmark(size, args.latency, args.workers, args.engine, args.seed)
+        # Se escribe después de cada tamaño: si uno grande se queda sin memoria, los anteriores quedan guardados
+        with open(output, "a", encoding="utf-8") as f:
+            for record in records:
+                record["started_at"] = started_at
+                f.write(json.dumps(record) + "\n")
+        results.extend(records)
+
+    print(pd.DataFrame(results).set_index(["size", "stage"])[
+        ["seconds", "rows", "rows_per_s", "peak_rss_mb", "files_written"]
+    ])
+    print(f"Resultados agregados a {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from deltalake import DeltaTable
+import ezequiel_nunzio_TP1 as pipeline
+
+
+# Tamaño objetivo de los archivos compactados (bytes)
+TARGET_FILE_SIZE = 128 * 1024 * 1024
+# Los archivos eliminados del log hace más de estas horas se borran del disco
+RETENTION_HOURS = 7 * 24
+# Columnas por las que se ordena Silver (Z-order): el mes y la celda de la grilla, que es lo que
+# usa `crimes_in_bbox` para descartar archivos en las consultas por zona
+SILVER_ZORDER_COLUMNS = ["crime_month", "spatial_cell"]
+
+
+def count_parquet_files(path):
+    """
+    Cuenta los archivos parquet en disco, incluidos los que ya no están en el log de Delta.
+    """
+    return sum(
+        name.endswith(".parquet")
+        for _, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def sample_queries(path):
+    """
+    Arma consultas representativas para una tabla de crímenes: el último mes cargado y
+    un recuadro de ~1 km alrededor de la mediana de las coordenadas de ese mes.
+
+    Retorna:
+    - dict: Nombre de la consulta -> expresión de filtro de pyarrow.dataset.
+    """
+    dataset = DeltaTable(path).to_pyarrow_dataset()
+    if "crime_month" in dataset.schema.names:
+        last_month = pc.max(dataset.to_table(columns=["crime_month"])["crime_month"])
+        month_filter = ds.field("crime_month") == last_month
+        coordinates = dataset.to_table(columns=["latitude", "longitude"], filter=month_filter)
+        lat = pc.approximate_median(coordinates["latitude"]).as_py()
+        lng = pc.approximate_median(coordinates["longitude"]).as_py()
+        cells = pipeline.cell_ranges(lat - 0.005, lng - 0.01, lat + 0.005, lng + 0.01)
+        area_filter = (
+            (ds.field("spatial_cell") >= cells[0][0])
+            & (ds.field("spatial_cell") <= cells[-1][1])
+            & (ds.field("latitude") >= pa.scalar(lat - 0.005, pa.float32()))
+            & (ds.field("latitude") <= pa.scalar(lat + 0.005, pa.float32()))
+            & (ds.field("longitude") >= pa.scalar(lng - 0.01, pa.float32()))
+            & (ds.field("longitude") <= pa.scalar(lng + 0.01, pa.float32()))
+        )
+        return {"month": month_filter, "month_area": month_filter & area_filter}
+
+    last_month = pc.max(dataset.to_table(columns=["month"])["month"])
+    return {"month": ds.field("month") == last_month}
+
+
+def table_report(path, queries):
+    """
+    Mide el estado de una tabla: archivos activos, archivos en disco y, para cada consulta,
+    cuántos archivos hay que leer y cuánto tarda.
+    """
+    dt = DeltaTable(path)
+    dataset = dt.to_pyarrow_dataset()
+    report = {
+        "version": dt.version(),
+        "active_files": len(dt.file_uris()),
+        "files_on_disk": count_parquet_files(path),
+    }
+    for name, expression in queries.items():
+        start = time.perf_counter()
+        rows = dataset.to_table(filter=expression).num_rows
+        report[f"{name}_seconds"] = round(time.perf_counter() - start, 4)
+        report[f"{name}_files_read"] = len(list(dataset.get_fragments(filter=expression)))
+        report[f"{name}_rows"] = rows
+    return report
+
+
+def maintain_table(path, zorder_columns=None, target_size=TARGET_FILE_SIZE, retention_hours=RETENTION_HOURS,
+                   enforce_retention=True):
+    """
+    Compacta (o Z-ordena) una tabla Delta y borra del disco los archivos vencidos.
+
+    Parámetros:
+    - path (str): Ruta de la tabla.
+    - zorder_columns (list, opcional): Si se indica, se ordena por estas columnas en lugar de solo compactar.
+    - target_size (int): Tamaño objetivo de los archivos resultantes, en bytes.
+    - retention_hours (int): Antigüedad mínima de los archivos eliminados para borrarlos.
+    - enforce_retention (bool): Si es False, se permite una retención menor que la de la tabla
+      (por defecto 7 días). Puede borrar archivos que todavía usan lectores en curso o el time travel.
+
+    Retorna:
+    - DataFrame con el estado de la tabla antes y después.
+    """
+    queries = sample_queries(path)
+    before = table_report(path, queries)
+
+    dt = DeltaTable(path)
+    if zorder_columns:
+        metrics = dt.optimize.z_order(zorder_columns, target_size=target_size)
+    else:
+        metrics = dt.optimize.compact(target_size=target_size)
+    print(f"{path}: {metrics.get('numFilesRemoved')} archivos reescritos en {metrics.get('numFilesAdded')}")
+
+    if not enforce_retention:
+        print(f"{path}: ATENCIÓN, vacuum sin controlar la retención mínima ({retention_hours} horas)")
+    deleted = DeltaTable(path).vacuum(retention_hours=retention_hours, dry_run=False,
+                                      enforce_retention_duration=enforce_retention)
+    print(f"{path}: {len(deleted)} archivos vencidos borrados")
+
+    after = table_report(path, queries)
+    return pd.DataFrame([before, after], index=["before", "after"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mantenimiento de las tablas Delta de crímenes.")
+    parser.add_argument("--target-size", type=int, default=TARGET_FILE_SIZE,
+                        help="Tamaño objetivo de los archivos compactados, en bytes.")
+    parser.add_argument("--retention-hours", type=int, default=RETENTION_HOURS,
+                        help="Antigüedad mínima de los archivos eliminados para borrarlos del disco.")
+    parser.add_argument("--force", action="store_true",
+                        help="Permite una retención menor que la de la tabla "
+                             "(puede borrar archivos de lecturas en curso y del time travel).")
+    args = parser.parse_args()
+
+    for path, zorder_columns in [(pipeline.BRONZE_PATH, None), (pipeline.SILVER_PATH, SILVER_ZORDER_COLUMNS)]:
+        if not DeltaTable.is_deltatable(path):
+            print(f"{path}: no existe, se omite")
+            continue
+        report = maintain_table(path, zorder_columns, args.target_size, args.retention_hours,
+                                enforce_retention=not args.force)
+        print(report.T)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import ezequiel_nunzio_TP1 as pipeline
+from delta_snapshot import latest_version
+from http_cache import ResponseCache
+
+
+# Estado de las etapas: huella de las entradas con que corrió cada una por última vez
+STATE_PATH = "data/pipeline/state.json"
+# Resultado de la extracción, que lee la etapa siguiente (también en otra corrida)
+LANDING_CRIMES = "data/landing/crimes.parquet"
+# Etapas que pueden correr a la vez (las que no dependen entre sí)
+MAX_STAGE_WORKERS = 4
+
+# Código de cada etapa: si cambia alguno de estos archivos, la etapa se vuelve a correr
+PIPELINE_CODE = ["ezequiel_nunzio_TP1.py", "pipeline_common.py", "delta_snapshot.py"]
+EXTRACT_CODE = PIPELINE_CODE + ["http_cache.py", "disk_cache.py"]
+SILVER_CODE = PIPELINE_CODE + ["dedup.py", "dtype_optimizer.py"]
+
+
+def file_digest(path):
+    """
+    Hash del contenido de un archivo, o None si no existe.
+    """
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def delta_version(path):
+    """
+    Versión actual de una tabla Delta, o None si no existe. Se lee del log (desde el último
+    checkpoint) sin abrir la tabla.
+    """
+    return latest_version(path)
+
+
+def code_version(files):
+    """
+    Hash de los archivos de código de una etapa (relativos a este módulo).
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    return {name: file_digest(os.path.join(here, name)) for name in files}
+
+
+def write_landing(df, path):
+    """
+    Guarda el resultado de una extracción en parquet, reemplazando el anterior de forma atómica.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def http_cache():
+    """
+    Cache de respuestas HTTP que usan las etapas de extracción, según la configuración del pipeline.
+    """
+    return ResponseCache(pipeline.HTTP_CACHE_DIR, ttl=pipeline.HTTP_CACHE_TTL) if pipeline.USE_HTTP_CACHE else None
+
+
+# 🔹 Etapas: entradas que forman su huella y lo que hacen
+
+def categories_inputs():
+    return {"base_url": pipeline.BASE_URL, "endpoint": pipeline.ENDPOINT_CATEGORIES, "months": pipeline.MONTHS}
+
+
+def run_categories():
+    # La dimensión solo cambia de versión (y Silver solo se rehace) si la lista de la API cambió
+    cache = http_cache()
+    df = pipeline.fetch_crime_categories(pipeline.BASE_URL, pipeline.ENDPOINT_CATEGORIES, pipeline.MONTHS, cache=cache)
+    dimension = pipeline.update_crime_categories(df)
+    if cache is not None:
+        print(f"Cache HTTP (categorías): {cache.stats()}")
+    return {"rows": dimension.num_rows, "categories_version": delta_version(pipeline.CATEGORIES_PATH)}
+
+
+def landing_months(path=LANDING_CRIMES):
+    """
+    Meses presentes en el resultado de la extracción, o un conjunto vacío si no existe.
+    """
+    if not os.path.exists(path) or "month" not in pq.read_schema(path).names:
+        return set()
+    return set(pq.read_table(path, columns=["month"])["month"].unique().to_pylist())
+
+
+def extract_inputs():
+    return {
+        "base_url": pipeline.BASE_URL,
+        "endpoint": pipeline.ENDPOINT_CRIMES_STREET,
+        "months": pipeline.MONTHS,
+        "area_poly": pipeline.AREA_POLY,
+        "max_tile_depth": pipeline.MAX_TILE_DEPTH,
+    }
+
+
+def extract_pending():
+    # Meses que no están ni en Bronze ni en la extracción anterior (por ejemplo, porque falló la
+    # solicitud): mientras haya alguno la etapa se repite aunque su huella no haya cambiado. No forma
+    # parte de la huella porque la misma etapa (y Bronze) lo vacían
+    return sorted(set(pipeline.MONTHS) - pipeline.ingested_months(pipeline.BRONZE_PATH) - landing_months())
+
+
+def run_extract():
+    # Solo se piden los meses que faltan en Bronze; el resto ya se extrajo en corridas anteriores
+    cache = http_cache()
+    df = pipeline.fetch_crime_data(
+        pipeline.BASE_URL, pipeline.ENDPOINT_CRIMES_STREET, pipeline.pending_months(pipeline.MONTHS),
+        pipeline.AREA_POLY, max_workers=pipeline.MAX_WORKERS, max_rps=pipeline.MAX_RPS, cache=cache,
+    )
+    write_landing(df, LANDING_CRIMES)
+    if cache is not None:
+        print(f"Cache HTTP (crímenes): {cache.stats()}")
+    return {"rows": len(df)}
+
+
+def bronze_inputs():
+    return {"landing": file_digest(LANDING_CRIMES)}
+
+
+def run_bronze():
+    pipeline.write_bronze(pq.read_table(LANDING_CRIMES).to_pandas())
+    return {"bronze_version": delta_version(pipeline.BRONZE_PATH)}
+
+
+def silver_inputs():
+    return {
+        "bronze_version": delta_version(pipeline.BRONZE_PATH),
+        "categories_version": delta_version(pipeline.CATEGORIES_PATH),
+        "mode": pipeline.SILVER_MODE,
+        "engine": pipeline.SILVER_ENGINE,
+    }
+
+
+def run_silver():
+    categories = pipeline.read_crime_categories()
+    if pipeline.SILVER_MODE == "incremental":
+        pipeline.upsert_silver(categories)
+    elif pipeline.SILVER_MODE == "streaming":
+        pipeline.process_crime_data_streaming(categories)
+    elif pipeline.SILVER_MODE == "parallel":
+        pipeline.process_crime_data_parallel(categories)
+    else:
+        pipeline.build_silver(categories, engine=pipeline.SILVER_ENGINE)
+    return {"silver_version": delta_version(pipeline.SILVER_PATH)}
+
+
+def gold_inputs():
+    return {"silver_version": delta_version(pipeline.SILVER_PATH), "dimensions": pipeline.GOLD_DIMENSIONS}
+
+
+def run_gold():
+    pipeline.update_gold()
+    return {}
+
+
+# Cada etapa: de qué etapas depende, qué entradas forman su huella, qué código usa, qué produce y cómo se corre.
+# "pending" (opcional) devuelve trabajo que falta aunque la huella no haya cambiado.
+# "categories" y "extract" son independientes y corren a la vez; "bronze" puede correr junto con "categories"
+STAGES = {
+    "categories": {"deps": [], "inputs": categories_inputs, "code": EXTRACT_CODE,
+                   "outputs": [pipeline.CATEGORIES_PATH], "run": run_categories},
+    "extract": {"deps": [], "inputs": extract_inputs, "pending": extract_pending, "code": EXTRACT_CODE,
+                "outputs": [LANDING_CRIMES], "run": run_extract},
+    "bronze": {"deps": ["extract"], "inputs": bronze_inputs, "code": PIPELINE_CODE,
+               "outputs": [pipeline.BRONZE_PATH], "run": run_bronze},
+    "silver": {"deps": ["bronze", "categories"], "inputs": silver_inputs, "code": SILVER_CODE,
+               "outputs": [pipeline.SILVER_PATH], "run": run_silver},
+    "gold": {"deps": ["silver"], "inputs": gold_inputs, "code": PIPELINE_CODE,
+             "outputs": [f"{pipeline.GOLD_PATH}/{name}" for name in pipeline.GOLD_DIMENSIONS], "run": run_gold},
+}
+
+
+class StageState:
+    """
+    Huellas de la última corrida exitosa de cada etapa, guardadas en un archivo JSON.
+
+    Se escribe después de cada etapa (reemplazo atómico), así una corrida interrumpida
+    conserva las etapas que ya terminaron.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.stages = json.load(f)
+        except (OSError, ValueError):
+            self.stages = {}
+
+    def fingerprint(self, name):
+        return self.stages.get(name, {}).get("fingerprint")
+
+    def record(self, name, entry):
+        with self._lock:
+            self.stages[name] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.stages, f, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+
+
+def stage_fingerprint(name):
+    """
+    Huella de las entradas de una etapa: parámetros, versiones de las tablas de entrada y código.
+    """
+    stage = STAGES[name]
+    key = json.dumps({"inputs": stage["inputs"](), "code": code_version(stage["code"])}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def run_stage(name, state, force=False):
+    """
+    Corre una etapa si cambió su huella, falta lo que produce o tiene trabajo pendiente; si no, la saltea.
+
+    Retorna:
+    - dict: Estado ("ran" o "skipped"), segundos y el resultado de la etapa.
+    """
+    stage = STAGES[name]
+    start = time.perf_counter()
+    fingerprint = stage_fingerprint(name)
+    outputs_exist = all(os.path.exists(path) for path in stage["outputs"])
+    pending = stage["pending"]() if "pending" in stage else None
+    if not force and outputs_exist and not pending and fingerprint == state.fingerprint(name):
+        return {"stage": name, "status": "skipped", "seconds": round(time.perf_counter() - start, 4)}
+
+    result = stage["run"]()
+    # La huella se guarda con las entradas que tenía la etapa al empezar: si cambiaron mientras
+    # corría, la próxima corrida la repite
+    entry = {"fingerprint": fingerprint, "finished_at": pd.Timestamp.now(tz="UTC").isoformat(), **result}
+    state.record(name, entry)
+    return {"stage": name, "status": "ran", "seconds": round(time.perf_counter() - start, 4), **result}
+
+
+def with_dependencies(names):
+    """
+    Agrega a las etapas pedidas todas las etapas de las que dependen.
+    """
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in STAGES:
+            raise ValueError(f"Etapa desconocida: {name}. Etapas: {', '.join(STAGES)}")
+        if name not in selected:
+            selected.add(name)
+            pending.extend(STAGES[name]["deps"])
+    return selected
+
+
+def run_stages(names=None, force=(), max_workers=MAX_STAGE_WORKERS, state_path=STATE_PATH):
+    """
+    Corre las etapas pedidas (y las que necesitan) respetando sus dependencias.
+
+    Cada etapa arranca apenas terminaron las etapas de las que depende, así que las etapas
+    independientes corren a la vez. Las que no cambiaron desde la última corrida se saltean.
+
+    Parámetros:
+    - names (list, opcional): Etapas a correr. Por defecto, todas.
+    - force (iterable): Etapas que se corren aunque su huella no haya cambiado.
+    - max_workers (int): Etapas simultáneas como máximo.
+
+    Retorna:
+    - DataFrame con una fila por etapa, en el orden en que terminaron.
+    """
+    selected = with_dependencies(names or list(STAGES))
+    state = StageState(state_path)
+    waiting = {name: [dep for dep in STAGES[name]["deps"] if dep in selected] for name in selected}
+    finished, results = set(), []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while waiting or running:
+            for name in [name for name, deps in waiting.items() if finished.issuperset(deps)]:
+                running[executor.submit(run_stage, name, state, name in force)] = name
+                del waiting[name]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                # Si una etapa falla no se arranca ninguna otra; las que están corriendo terminan
+                result = future.result()
+                print(f"Etapa {name}: {result}")
+                results.append(result)
+                finished.add(name)
+
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Corre las etapas del pipeline de crímenes y saltea las que no cambiaron."
+    )
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"Etapas a correr, con las que necesitan ({', '.join(STAGES)}). Por defecto, todas.")
+    parser.add_argument("--force", nargs="*", default=None, metavar="stage",
+                        help="Corre estas etapas aunque no hayan cambiado (sin nombres: todas las elegidas).")
+    parser.add_argument("--workers", type=int, default=MAX_STAGE_WORKERS, help="Etapas simultáneas como máximo.")
+    args = parser.parse_args()
+
+    try:
+        selected = with_dependencies(args.stages or list(STAGES))
+    except ValueError as e:
+        parser.error(str(e))
+    force = () if args.force is None else (args.force or selected)
+    start = time.perf_counter()
+    run_stages(args.stages, force=set(force), max_workers=args.workers)
+    print(f"Pipeline: {round(time.perf_counter() - start, 4)} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from deltalake import DeltaTable
+
+from profiling import measure
+
+
+# Qué fila se conserva por clave: la primera, la última o la de mayor valor en la columna `by`
+KEEP_OPTIONS = ("first", "last", "latest")
+# Filas por lote al recorrer una tabla Delta
+BATCH_SIZE = 1_000_000
+# Tamaño por defecto del benchmark: filas y claves distintas
+BENCHMARK_ROWS = 10_000_000
+BENCHMARK_KEYS = 2_000_000
+SEED = 42
+
+
+def group_codes(df, keys):
+    """
+    Número de grupo de cada fila según las columnas clave, calculado con una tabla hash (sin ordenar).
+    """
+    if len(keys) == 1:
+        return pd.factorize(df[keys[0]], use_na_sentinel=False)[0]
+    return df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+
+
+def keep_mask(df, keys, keep="last", by=None):
+    """
+    Máscara booleana de las filas que sobreviven a la deduplicación, en una sola pasada de hash.
+
+    Con keep="latest" se conserva la fila con el mayor valor de `by` en cada clave; si hay
+    empate gana la última, igual que ordenando por `by` y quedándose con la última. Los nulos
+    de `by` pierden contra cualquier valor.
+    """
+    codes = group_codes(df, keys)
+    if keep in ("first", "last"):
+        return ~pd.Series(codes).duplicated(keep=keep).to_numpy()
+
+    values = df[by].reset_index(drop=True)
+    best = values.groupby(codes, sort=False).transform("max")
+    candidates = np.flatnonzero((values.eq(best) | best.isna()).to_numpy())
+    mask = np.zeros(len(df), dtype=bool)
+    mask[candidates[~pd.Series(codes[candidates]).duplicated(keep="last").to_numpy()]] = True
+    return mask
+
+
+def check_options(keys, keep, by):
+    """
+    Valida los parámetros comunes y devuelve las claves como lista.
+    """
+    if keep not in KEEP_OPTIONS:
+        raise ValueError(f"keep debe ser uno de {KEEP_OPTIONS}: {keep}")
+    if keep == "latest" and by is None:
+        raise ValueError('keep="latest" necesita la columna `by`')
+    return [keys] if isinstance(keys, str) else list(keys)
+
+
+def deduplicate(data, keys, keep="last", by=None):
+    """
+    Deja una fila por clave sin ordenar la tabla: reemplaza a `sort_values(...).drop_duplicates(...)`.
+
+    Parámetros:
+    - data (DataFrame, pa.Table o pa.RecordBatch): Datos a deduplicar.
+    - keys (str o list): Columnas que forman la clave.
+    - keep (str): "first", "last" o "latest" (mayor valor de `by`).
+    - by (str): Columna que define el registro más reciente con keep="latest".
+
+    Retorna:
+    - Los datos deduplicados, del mismo tipo que `data` y en el orden original de las filas.
+    """
+    keys = check_options(keys, keep, by)
+    if isinstance(data, pd.DataFrame):
+        return data[keep_mask(data, keys, keep, by)]
+    # En Arrow solo pasan a pandas las columnas necesarias para calcular la máscara
+    columns = keys + ([by] if keep == "latest" and by not in keys else [])
+    return data.filter(pa.array(keep_mask(data.select(columns).to_pandas(), keys, keep, by)))
+
+
+def key_index(df, keys):
+    """
+    Índice (hash) con las claves de las filas, para buscar claves ya vistas entre lotes.
+    """
+    if len(keys) == 1:
+        return pd.Index(df[keys[0]])
+    return pd.MultiIndex.from_frame(df[keys])
+
+
+class SeenKeys:
+    """
+    Claves ya vistas entre lotes, para buscar las de un lote nuevo sin recorrer todas las anteriores.
+
+    Las claves se guardan en niveles (índices de pandas sin repetidos): la tabla hash de cada nivel
+    se arma una sola vez y se reutiliza en cada búsqueda. Cada lote agrega un nivel y se unen los
+    últimos mientras uno no duplique al siguiente; así cada clave se vuelve a indexar O(log n) veces
+    y hay O(log n) niveles, en lugar de reconstruir el hash de todas las claves en cada lote.
+    """
+
+    def __init__(self):
+        self.levels = []
+
+    def contains(self, index):
+        """
+        Máscara de las claves de `index` que ya se vieron.
+        """
+        seen = np.zeros(len(index), dtype=bool)
+        for level in self.levels:
+            seen |= level.get_indexer(index) >= 0
+        return seen
+
+    def add(self, index):
+        """
+        Agrega claves nuevas (sin repetidos entre sí ni con las ya vistas).
+        """
+        if not len(index):
+            return
+        self.levels.append(index)
+        while len(self.levels) > 1 and len(self.levels[-2]) < 2 * len(self.levels[-1]):
+            last = self.levels.pop()
+            self.levels[-1] = self.levels[-1].append(last)
+
+
+def concat(parts):
+    """
+    Une DataFrames o tablas Arrow (del mismo tipo).
+    """
+    if isinstance(parts[0], pd.DataFrame):
+        return pd.concat(parts)
+    return pa.concat_tables(parts)
+
+
+def deduplicate_batches(batches, keys, keep="last", by=None):
+    """
+    Deduplica un flujo de lotes (DataFrames, tablas o record batches de Arrow) sin juntarlos.
+
+    - keep="first": cada lote se emite apenas se procesa, sin las claves que ya aparecieron. Solo
+      se guardan en memoria las claves vistas (`SeenKeys`): cada lote busca solo sus propias claves,
+      sin volver a indexar todas las anteriores.
+    - keep="last" o "latest": se mantiene una fila por clave (las ganadoras hasta el momento) y el
+      resultado se emite al terminar, porque un lote posterior puede reemplazar cualquier fila.
+      La memoria depende de la cantidad de claves distintas, no del total de filas.
+
+    Retorna:
+    - generator de lotes deduplicados (con keep="last"/"latest", uno solo al final).
+    """
+    keys = check_options(keys, keep, by)
+    seen = SeenKeys()
+    winners = None
+    for batch in batches:
+        if isinstance(batch, pa.RecordBatch):
+            batch = pa.Table.from_batches([batch])
+        if keep != "first":
+            # Las ganadoras previas van antes que el lote: ante un empate gana la fila más nueva
+            winners = deduplicate(batch if winners is None else concat([winners, batch]), keys, keep, by)
+            continue
+
+        batch = deduplicate(batch, keys, "first")
+        batch_keys = batch[keys] if isinstance(batch, pd.DataFrame) else batch.select(keys).to_pandas()
+        index = key_index(batch_keys, keys)
+        new = ~seen.contains(index)
+        if not new.all():
+            batch, index = batch[new] if isinstance(batch, pd.DataFrame) else batch.filter(pa.array(new)), index[new]
+        seen.add(index)
+        if len(batch):
+            yield batch
+
+    if winners is not None:
+        yield winners
+
+
+def deduplicate_delta(path, keys, keep="last", by=None, columns=None, batch_size=BATCH_SIZE):
+    """
+    Deduplica una tabla Delta recorriendo sus archivos por lotes, sin cargarla completa.
+
+    Con keep="first"/"last" el orden es el de los archivos de la tabla; para un resultado que no
+    dependa de ese orden conviene keep="latest".
+
+    Retorna:
+    - pa.Table con una fila por clave.
+    """
+    dataset = DeltaTable(path).to_pyarrow_dataset()
+    batches = dataset.to_batches(columns=columns, batch_size=batch_size)
+    parts = list(deduplicate_batches(batches, keys, keep, by))
+    return pa.concat_tables(parts) if parts else dataset.schema.empty_table()
+
+
+def benchmark_data(rows=BENCHMARK_ROWS, keys=BENCHMARK_KEYS, seed=SEED):
+    """
+    Precios con fecha por ID, como en `Data Processing part 2.py`, con `keys` IDs distintos.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2021-01-01", "s").astype(np.int64)
+    return pd.DataFrame({
+        "ID": rng.integers(0, keys, rows),
+        "Price": rng.uniform(1, 10, rows).round(2),
+        "Date_price": (start + rng.integers(0, 365 * 24 * 3600, rows)).astype("datetime64[s]"),
+    })
+
+
+def benchmark_deduplicate(rows=BENCHMARK_ROWS, keys=BENCHMARK_KEYS, batch_size=BATCH_SIZE, seed=SEED):
+    """
+    Compara "último precio por ID" con orden + drop_duplicates, con `deduplicate` y con
+    `deduplicate_batches` (por lotes de `batch_size` filas), y verifica que den lo mismo.
+
+    Retorna:
+    - DataFrame con segundos, filas por segundo y pico de memoria por método.
+    """
+    df = benchmark_data(rows, keys, seed)
+    methods = {
+        "sort": lambda: df.sort_values(["ID", "Date_price"]).drop_duplicates("ID", keep="last"),
+        "hash": lambda: deduplicate(df, "ID", keep="latest", by="Date_price"),
+        "hash_streaming": lambda: concat(list(deduplicate_batches(
+            (df.iloc[start:start + batch_size] for start in range(0, rows, batch_size)),
+            "ID", keep="latest", by="Date_price",
+        ))),
+    }
+
+    results, expected = [], None
+    for name, method in methods.items():
+        with measure() as stats:
+            result = method()
+        latest = result.set_index("ID")["Date_price"].sort_index()
+        expected = latest if expected is None else expected
+        results.append({
+            "method": name,
+            "rows": rows,
+            "keys": len(result),
+            "matches_sort": bool(latest.equals(expected)),
+            "rows_per_s": round(rows / stats["seconds"]) if stats["seconds"] else None,
+            **stats,
+        })
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de deduplicación por hash contra orden + drop_duplicates.")
+    parser.add_argument("--rows", type=int, default=BENCHMARK_ROWS, help="Filas generadas.")
+    parser.add_argument("--keys", type=int, default=BENCHMARK_KEYS, help="Claves distintas.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Filas por lote en modo streaming.")
+    parser.add_argument("--seed", type=int, default=SEED, help="Semilla de los datos generados.")
+    args = parser.parse_args()
+    print(benchmark_deduplicate(args.rows, args.keys, args.batch_size, args.seed).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import argparse
+import base64
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from deltalake import DeltaTable, PostCommitHookProperties, write_deltalake
+
+
+# Commits entre checkpoints del log: al abrir una tabla se lee el último checkpoint y a lo sumo
+# esta cantidad de commits JSON, sin importar cuán larga sea la historia
+CHECKPOINT_INTERVAL = 100
+# Directorio por defecto de las fotos de las tablas (archivos activos con estadísticas y esquema)
+SNAPSHOT_DIR = "data/cache/snapshots"
+# Claves de la metadata del parquet de cada foto
+SCHEMA_KEY = b"delta_snapshot.schema"
+VERSION_KEY = b"delta_snapshot.version"
+COMMIT_KEY = b"delta_snapshot.commit"
+# Tamaño por defecto del benchmark: commits totales y en qué puntos de la historia se mide
+BENCHMARK_COMMITS = 10_000
+BENCHMARK_POINTS = [100, 1_000, 10_000]
+BENCHMARK_REPEAT = 3
+
+
+def last_checkpoint(path):
+    """
+    Versión del último checkpoint de una tabla local, según `_delta_log/_last_checkpoint`, o None.
+    """
+    try:
+        with open(os.path.join(path, "_delta_log", "_last_checkpoint"), encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def latest_version(path):
+    """
+    Última versión de una tabla Delta local sin abrirla: se parte del último checkpoint y se
+    buscan los commits JSON siguientes, que son a lo sumo `CHECKPOINT_INTERVAL`.
+
+    Retorna:
+    - int o None: None si la tabla no existe.
+    """
+    log_dir = os.path.join(path, "_delta_log")
+    checkpoint = last_checkpoint(path)
+    version = -1 if checkpoint is None else checkpoint
+    while os.path.exists(os.path.join(log_dir, f"{version + 1:020d}.json")):
+        version += 1
+    return None if version < 0 else version
+
+
+def commit_stamp(path, version):
+    """
+    Identifica el commit `version` de una tabla local por el tamaño y la fecha de modificación de
+    su archivo en el log (el JSON o, si ya se borró, el checkpoint). Si la tabla se borra y se vuelve
+    a crear, la misma versión tiene otro archivo y otra marca.
+
+    Retorna:
+    - str o None: None si no hay archivo de esa versión en el log.
+    """
+    for name in (f"{version:020d}.json", f"{version:020d}.checkpoint.parquet"):
+        try:
+            stat = os.stat(os.path.join(path, "_delta_log", name))
+        except OSError:
+            continue
+        return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return None
+
+
+def checkpoint_if_due(path, interval=CHECKPOINT_INTERVAL, version=None):
+    """
+    Escribe un checkpoint si desde el último (o desde el inicio) pasaron `interval` commits o más.
+
+    Retorna:
+    - bool: Si se escribió un checkpoint.
+    """
+    version = latest_version(path) if version is None else version
+    checkpoint = last_checkpoint(path)
+    if version is None or version - (-1 if checkpoint is None else checkpoint) < interval:
+        return False
+    DeltaTable(path, version=version).create_checkpoint()
+    return True
+
+
+def snapshot_dataset(path, actions, schema):
+    """
+    Dataset de pyarrow sobre los archivos de una foto, sin abrir la tabla Delta.
+
+    Cada archivo lleva como expresión de partición sus valores de partición, así las columnas
+    de partición aparecen en los datos leídos igual que con `DeltaTable.to_pyarrow_dataset`.
+    """
+    partition_columns = [name.split(".", 1)[1] for name in actions.column_names if name.startswith("partition.")]
+    file_format = ds.ParquetFileFormat()
+    filesystem = pafs.LocalFileSystem()
+    root = os.path.abspath(path)
+    fragments = []
+    for action in actions.select(["path", *(f"partition.{name}" for name in partition_columns)]).to_pylist():
+        expression = ds.scalar(True)
+        for name in partition_columns:
+            value = action[f"partition.{name}"]
+            field = ds.field(name)
+            expression &= field.is_null() if value is None else field == pa.scalar(value).cast(schema.field(name).type)
+        fragments.append(file_format.make_fragment(os.path.join(root, action["path"]), filesystem,
+                                                   partition_expression=expression))
+    return ds.FileSystemDataset(fragments, schema, file_format, filesystem)
+
+
+class SnapshotCache:
+    """
+    Cache en disco de la foto de tablas Delta locales: los archivos activos con sus estadísticas
+    (las acciones "add" aplanadas) y el esquema, por versión.
+
+    La última versión se obtiene sin abrir la tabla (`latest_version`); si ya hay una foto de
+    esa versión, listar los archivos no relee el log. Cada foto guarda la marca del commit
+    (`commit_stamp`) y solo se usa si coincide, así una tabla borrada y vuelta a crear no
+    devuelve la lista de archivos vieja. Al guardar una foto nueva se borran las de versiones
+    anteriores de la misma tabla.
+
+    Parámetros:
+    - cache_dir (str): Carpeta donde se guardan las fotos.
+
+    Uso:
+        snapshots = SnapshotCache()
+        version, actions, schema = snapshots.load("data/silver/crimes")
+        dataset = snapshot_dataset("data/silver/crimes", actions, schema)
+    """
+
+    def __init__(self, cache_dir=SNAPSHOT_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _prefix(self, table_path):
+        return os.path.join(self.cache_dir, hashlib.sha256(os.path.abspath(table_path).encode()).hexdigest()[:32])
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def load(self, table_path, version=None):
+        """
+        Foto de una tabla en `version` (por defecto, la última).
+
+        Retorna:
+        - (int, pa.Table, pa.Schema): La versión, las acciones "add" aplanadas
+          (`DeltaTable.get_add_actions(flatten=True)`) y el esquema de la tabla.
+        """
+        version = latest_version(table_path) if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No es una tabla Delta: {table_path}")
+        prefix = self._prefix(table_path)
+        path = f"{prefix}-{version:020d}.parquet"
+        stamp = commit_stamp(table_path, version)
+        try:
+            actions = pq.read_table(path)
+            metadata = actions.schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            actions, metadata = None, {}
+        # Una foto de otra tabla con la misma ruta y versión (borrada y vuelta a crear) no sirve
+        if actions is not None and stamp is not None and metadata.get(COMMIT_KEY) == stamp.encode():
+            self._count("hits")
+            schema = pa.ipc.read_schema(pa.py_buffer(base64.b64decode(metadata[SCHEMA_KEY])))
+            return version, actions.replace_schema_metadata(None), schema
+
+        self._count("misses")
+        dt = DeltaTable(table_path, version=version)
+        actions = pa.table(dt.get_add_actions(flatten=True))
+        schema = pa.schema(dt.schema().to_arrow())
+        metadata = {
+            SCHEMA_KEY: base64.b64encode(schema.serialize().to_pybytes()),
+            VERSION_KEY: str(version),
+            COMMIT_KEY: stamp or "",
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(actions.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, path)  # Reemplazo atómico: nunca queda una foto a medio escribir
+        for old_path in glob.glob(f"{prefix}-*.parquet"):
+            if old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return version, actions, schema
+
+    def dataset(self, table_path, version=None):
+        """
+        Dataset de pyarrow de la tabla en `version` (por defecto, la última), desde su foto.
+        """
+        _, actions, schema = self.load(table_path, version)
+        return snapshot_dataset(table_path, actions, schema)
+
+    def stats(self):
+        """
+        Devuelve la cantidad de aciertos y fallos desde que se creó el cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+def time_best(function, repeat=BENCHMARK_REPEAT):
+    """
+    Segundos de la ejecución más rápida de `function` entre `repeat` intentos.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4)
+
+
+def benchmark_table_open(commits=BENCHMARK_COMMITS, points=BENCHMARK_POINTS, interval=CHECKPOINT_INTERVAL,
+                         repeat=BENCHMARK_REPEAT):
+    """
+    Mide cuánto cuesta abrir una tabla y listar sus archivos a medida que crece su historia.
+
+    Se escribe una tabla con `commits` sobrescrituras chicas (con un checkpoint cada `interval`
+    commits, como en el pipeline) y en cada punto de `points` se mide abrir la tabla y listar
+    sus archivos activos:
+    - log: solo con los commits JSON (una copia del log sin checkpoints), lo que se hacía antes.
+    - checkpoint: con los checkpoints.
+    - snapshot: desde la foto cacheada de esa versión (sin abrir la tabla).
+
+    Retorna:
+    - DataFrame con los segundos de cada método (el mejor de `repeat`) por cantidad de commits.
+    """
+    points = sorted(point for point in points if point <= commits)
+    data = pa.table({"value": [1]})
+    # Los checkpoints los escribe `checkpoint_if_due`, con el intervalo pedido
+    hook = PostCommitHookProperties(create_checkpoint=False)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "table")
+        log_only = os.path.join(tmp, "log_only")
+        os.makedirs(os.path.join(log_only, "_delta_log"))
+        snapshots = SnapshotCache(os.path.join(tmp, "snapshots"))
+
+        start = time.perf_counter()
+        for version in range(commits):
+            write_deltalake(path, data, mode="overwrite", post_commithook_properties=hook)
+            checkpoint_if_due(path, interval, version)
+            if version + 1 not in points:
+                continue
+
+            write_seconds = round(time.perf_counter() - start, 4)
+            # La copia sin checkpoints comparte los commits JSON (enlaces, sin copiar datos)
+            for name in os.listdir(os.path.join(path, "_delta_log")):
+                target = os.path.join(log_only, "_delta_log", name)
+                if name.endswith(".json") and not os.path.exists(target):
+                    os.link(os.path.join(path, "_delta_log", name), target)
+            snapshots.load(path)
+            row = {"commits": version + 1, "write_seconds": write_seconds}
+            for method, table_path in (("log", log_only), ("checkpoint", path)):
+                row[f"{method}_s"] = time_best(lambda: DeltaTable(table_path).get_add_actions(flatten=True), repeat)
+            row["snapshot_s"] = time_best(lambda: snapshots.load(path), repeat)
+            results.append(row)
+            print(f"Apertura con {version + 1} commits: {row}")
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mide abrir una tabla Delta y listar sus archivos con miles de commits, con y sin checkpoints."
+    )
+    parser.add_argument("--commits", type=int, default=BENCHMARK_COMMITS, help="Commits de la tabla de prueba.")
+    parser.add_argument("--points", type=int, nargs="*", default=BENCHMARK_POINTS, help="Commits en los que se mide.")
+    parser.add_argument("--interval", type=int, default=CHECKPOINT_INTERVAL, help="Commits entre checkpoints.")
+    parser.add_argument("--repeat", type=int, default=BENCHMARK_REPEAT, help="Repeticiones por medición.")
+    args = parser.parse_args()
+    print(benchmark_table_open(args.commits, args.points, args.interval, args.repeat).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    Base de los caches en disco: un archivo por entrada (con extensión `suffix`), escritura
+    atómica, contadores y borrado LRU cuando el total supera `max_bytes`.
+
+    El tamaño y el orden de uso de las entradas se leen de la carpeta una sola vez, al crear el
+    cache, y después se actualizan con cada escritura y cada acierto: guardar una entrada no
+    vuelve a recorrer la carpeta. Lo que escriba otro proceso en la misma carpeta se ve al crear
+    el próximo cache.
+
+    Parámetros:
+    - cache_dir (str): Carpeta donde se guardan las entradas.
+    - suffix (str): Extensión de los archivos de las entradas.
+    - max_bytes (int): Tamaño máximo total de las entradas en disco.
+    """
+
+    def __init__(self, cache_dir, suffix, max_bytes):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(suffix):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        # Nombre -> tamaño, de la entrada usada hace más tiempo a la más reciente
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._total = sum(self._entries.values())
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + self.suffix)
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _touch(self, path):
+        """
+        Marca una entrada como usada recientemente (LRU).
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        name = os.path.basename(path)
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+
+    def _store(self, path, write):
+        """
+        Guarda una entrada escribiéndola con `write(tmp_path)` y reemplazándola de forma atómica
+        (nunca queda una entrada a medio escribir). Después borra las entradas usadas hace más
+        tiempo hasta quedar por debajo de `max_bytes`.
+        """
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        name = os.path.basename(path)
+        with self._lock:
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._total > self.max_bytes and self._entries:
+                old_name, old_size = self._entries.popitem(last=False)
+                try:
+                    os.remove(os.path.join(self.cache_dir, old_name))
+                except OSError:
+                    pass
+                self._total -= old_size
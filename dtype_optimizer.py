@@ -0,0 +1,242 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# Proporción máxima de valores distintos (sobre los no nulos) para guardar un texto como category
+CATEGORY_RATIO = 0.5
+# Tipo para los textos con muchos valores distintos: string respaldado por Arrow
+STRING_DTYPE = pd.StringDtype("pyarrow")
+# Anchos enteros candidatos, de menor a mayor. Los sin signo son opcionales porque Delta no los admite
+SIGNED_DTYPES = ["int8", "int16", "int32", "int64"]
+UNSIGNED_DTYPES = ["uint8", "uint16", "uint32", "uint64"]
+
+
+class LossyCastError(ValueError):
+    """
+    Se pidió una conversión de tipo que cambiaría valores (desborde, redondeo o nulos nuevos).
+    """
+
+
+def profile_column(series):
+    """
+    Perfila una columna: tipo, tasa de nulos, cardinalidad y rango.
+
+    Retorna:
+    - dict con dtype, null_rate, unique, min, max (solo numéricas) e integral (si todos los
+      valores no nulos son enteros, aunque la columna sea float).
+    """
+    values = series.dropna()
+    profile = {
+        "dtype": str(series.dtype),
+        "null_rate": round(1 - len(values) / len(series), 4) if len(series) else 0.0,
+        "unique": values.nunique(),
+        "min": None,
+        "max": None,
+        "integral": False,
+    }
+    if is_number(series) and len(values):
+        profile.update({"min": values.min(), "max": values.max()})
+        profile["integral"] = pd.api.types.is_integer_dtype(series) or bool(
+            np.isfinite(values).all() and (values == np.floor(values)).all()
+        )
+    return profile
+
+
+def is_number(series):
+    """
+    Indica si la columna es numérica (los booleanos no cuentan).
+    """
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def is_text(series):
+    """
+    Indica si todos los valores no nulos de la columna son strings.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    if pd.api.types.is_string_dtype(series):
+        return pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty")
+    return False
+
+
+def smallest_integer(low, high, unsigned=False, nullable=False):
+    """
+    Devuelve el entero más chico que contiene el rango [low, high].
+    """
+    candidates = (UNSIGNED_DTYPES if unsigned and low >= 0 else []) + SIGNED_DTYPES
+    candidates.sort(key=lambda dtype: np.dtype(dtype).itemsize)
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype.capitalize().replace("Uint", "UInt") if nullable else dtype
+    return None
+
+
+def is_lossless(original, converted, tolerance=0.0):
+    """
+    Comprueba que `converted` tenga los mismos valores y los mismos nulos que `original`.
+
+    Parámetros:
+    - tolerance (float): Error absoluto admitido entre valores numéricos (0 = exactos).
+    """
+    missing = original.isna().to_numpy()
+    if not np.array_equal(missing, converted.isna().to_numpy()):
+        return False
+    before, after = original[~missing], converted[~missing]
+    if not len(before) or pd.api.types.is_datetime64_any_dtype(after):
+        # Una fecha que no se puede interpretar hace fallar la conversión o queda nula
+        return True
+
+    if is_number(after):
+        if not is_number(before):
+            before = pd.to_numeric(before, errors="coerce")
+            if before.isna().any():
+                return False
+        if pd.api.types.is_integer_dtype(before) and pd.api.types.is_integer_dtype(after):
+            # Se compara como objetos para no perder precisión con enteros grandes
+            return bool((before.astype(object).to_numpy() == after.astype(object).to_numpy()).all())
+        error = np.abs(before.to_numpy(dtype="float64") - after.to_numpy(dtype="float64"))
+        return bool(error.max() <= tolerance)
+
+    return bool((before.astype(object).to_numpy() == after.astype(object).to_numpy()).all())
+
+
+def cast_column(series, dtype, tolerance=0.0):
+    """
+    Convierte una columna y devuelve None si la conversión falla o cambia algún valor.
+    """
+    try:
+        converted = series.astype(dtype)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return converted if is_lossless(series, converted, tolerance) else None
+
+
+def cast_array(values, target_type, tolerance=0.0, name="valores", memory_pool=None):
+    """
+    Equivalente de una conversión pedida explícitamente (`dtypes` en `optimize_dtypes`) para
+    arrays de Arrow: convierte `values` a `target_type` y lanza `LossyCastError` si la
+    conversión falla, agrega nulos o cambia algún valor.
+
+    A tipos float se admite un error absoluto de `tolerance` respecto del valor en float64 (los
+    textos se comparan con el número que representan); al resto de los tipos se les exige que
+    la conversión de vuelta dé el valor original.
+
+    Retorna:
+    - pa.Array o pa.ChunkedArray de tipo `target_type`.
+    """
+    pool = {"memory_pool": memory_pool}
+    try:
+        converted = pc.cast(values, target_type, **pool)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+        raise LossyCastError(f"La columna '{name}' no se puede convertir a {target_type}: {error}") from error
+    if converted.null_count != values.null_count:
+        raise LossyCastError(f"La columna '{name}' tendría nulos nuevos al convertirla a {target_type}")
+    if pa.types.is_floating(target_type):
+        reference = pc.cast(values, pa.float64(), **pool)
+        difference = pc.subtract(pc.cast(converted, pa.float64(), **pool), reference, **pool)
+        error = pc.max(pc.abs(difference, **pool), **pool).as_py()
+        lossless = error is None or error <= tolerance
+    else:
+        error = None
+        lossless = pc.all(pc.equal(pc.cast(converted, values.type, **pool), values, **pool)).as_py() is not False
+    if not lossless:
+        detail = f" (error máximo {error:g})" if error is not None else ""
+        raise LossyCastError(f"La columna '{name}' no se puede convertir a {target_type} sin perder datos{detail}")
+    return converted
+
+
+def candidate_dtypes(series, profile, category_ratio=CATEGORY_RATIO, unsigned=False):
+    """
+    Tipos más chicos que podría tener la columna según su perfil, del preferido al menos preferido.
+    """
+    non_null = len(series) - series.isna().sum()
+    if is_number(series) and profile["min"] is not None:
+        nullable = profile["null_rate"] > 0 or isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+        candidates = []
+        if profile["integral"]:
+            integer = smallest_integer(profile["min"], profile["max"], unsigned, nullable)
+            if integer:
+                candidates.append(integer)
+        if str(series.dtype) in ("float64", "Float64"):
+            candidates.append("Float32" if nullable and str(series.dtype) == "Float64" else "float32")
+        return candidates
+    if is_text(series) and non_null:
+        if profile["unique"] <= category_ratio * non_null:
+            return ["category"]
+        if not isinstance(series.dtype, pd.StringDtype) or series.dtype.storage != "pyarrow":
+            return [STRING_DTYPE]
+    return []
+
+
+def optimize_dtypes(df, dtypes=None, tolerance=None, category_ratio=CATEGORY_RATIO, unsigned=False, exclude=()):
+    """
+    Elige para cada columna el tipo más chico que guarda exactamente los mismos valores.
+
+    Cada columna se perfila (rango, cardinalidad y nulos) y se prueba:
+    - Numéricas: el entero más chico que contiene su rango (también para floats sin decimales;
+      si tienen nulos queda un entero nullable) y, si no, float32.
+    - Texto: category si tiene pocos valores distintos (`category_ratio`); si no, string de Arrow.
+    Una conversión automática que cambiaría algún valor se descarta y la columna queda como está.
+
+    Parámetros:
+    - df (DataFrame): Datos a optimizar (no se modifica).
+    - dtypes (dict): Tipos pedidos explícitamente por columna. Se validan igual que los automáticos,
+      pero si cambian algún valor se lanza `LossyCastError` en lugar de ignorarlos.
+    - tolerance (dict): Error absoluto admitido por columna al pasar a float (por defecto 0).
+    - category_ratio (float): Proporción máxima de valores distintos para usar category.
+    - unsigned (bool): Si se permiten enteros sin signo (Delta no los admite).
+    - exclude (iterable): Columnas que no se tocan.
+
+    Retorna:
+    - (DataFrame, DataFrame): Los datos convertidos y un reporte por columna con el perfil, el
+      tipo anterior y el nuevo, y la memoria antes y después (bytes).
+    """
+    dtypes = dtypes or {}
+    tolerance = tolerance or {}
+    result = df.copy()
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        profile = profile_column(series)
+        if col in dtypes:
+            converted = cast_column(series, dtypes[col], tolerance.get(col, 0.0))
+            if converted is None:
+                raise LossyCastError(
+                    f"La columna '{col}' no se puede convertir a {dtypes[col]} sin perder datos "
+                    f"(rango {profile['min']} a {profile['max']}, nulos {profile['null_rate']:.2%})"
+                )
+            result[col] = converted
+        elif col not in exclude:
+            for dtype in candidate_dtypes(series, profile, category_ratio, unsigned):
+                converted = cast_column(series, dtype, tolerance.get(col, 0.0))
+                if converted is not None:
+                    result[col] = converted
+                    break
+
+        rows.append({
+            "column": col,
+            "dtype_before": profile.pop("dtype"),
+            "dtype_after": str(result[col].dtype),
+            **profile,
+            "bytes_before": series.memory_usage(deep=True, index=False),
+            "bytes_after": result[col].memory_usage(deep=True, index=False),
+        })
+
+    report = pd.DataFrame(rows).set_index("column").drop(columns="integral")
+    return result, report
+
+
+def memory_summary(report):
+    """
+    Resume un reporte de `optimize_dtypes`: memoria total antes y después (MB) y reducción.
+    """
+    before, after = int(report["bytes_before"].sum()), int(report["bytes_after"].sum())
+    return {
+        "memory_before_mb": round(before / 2**20, 2),
+        "memory_after_mb": round(after / 2**20, 2),
+        "reduction": round(1 - after / before, 4) if before else 0.0,
+    }
@@ -1,6 +1,30 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from urllib.parse import unquote
+
 import requests
 import pandas as pd
-from deltalake import write_deltalake, DeltaTable
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+from deltalake import write_deltalake, DeltaTable, Schema, WriterProperties
+from deltalake.transaction import AddAction, create_table_with_add_actions
+
+from dedup import deduplicate
+from delta_snapshot import SnapshotCache, snapshot_dataset
+from dtype_optimizer import cast_array
+from pipeline_common import BRONZE_ROW_GROUP_SIZE, commit_value, create_session, delta_commit, get_data, rate_limiter
+from profiling import data_bytes, measure, metrics
+from query_cache import QueryCache
+from synthetic_data import write_fake_crimes
 
 
 # Parámetros de la API para 
@@ -10,92 +34,542 @@ ENDPOINT_CATEGORIES = "crime-categories"
 MONTHS = ["2024-01", "2024-02", "2024-03"]
 AREA_POLY = "52.268,0.543:52.794,0.238:52.130,0.478"
 
+# Concurrencia de la extracción: police.uk permite 15 solicitudes por segundo
+MAX_WORKERS = 4
+MAX_RPS = 15
+
+# police.uk responde 503 cuando el polígono contiene más de 10.000 crímenes;
+# en ese caso se divide en cuadrantes hasta esta profundidad como máximo
+STATUS_AREA_TOO_LARGE = 503
+MAX_TILE_DEPTH = 6
+
+# Cache de respuestas HTTP en disco. Los meses con más de CACHE_FROZEN_MONTHS de
+# antigüedad ya no cambian en police.uk, así que se cachean sin vencimiento
+USE_HTTP_CACHE = True
+HTTP_CACHE_DIR = "data/cache/http"
+HTTP_CACHE_TTL = 24 * 60 * 60
+CACHE_FROZEN_MONTHS = 3
+# Cache de resultados de consultas sobre Silver/Gold: se invalida solo cuando cambia la versión de la tabla
+QUERY_CACHE_DIR = "data/cache/queries"
+# Fotos de las tablas (archivos activos con estadísticas), por versión: listar archivos no relee el log
+SNAPSHOT_CACHE_DIR = "data/cache/snapshots"
+
 BRONZE_PATH = "data/bronze/crimes"
 SILVER_PATH = "data/silver/crimes"
 GOLD_PATH = "data/gold/crimes"
+# Dimensión de categorías de crimen: una fila por categoría, con una clave entera que no cambia entre versiones
+CATEGORIES_PATH = "data/silver/crime_categories"
+CATEGORIES_SCHEMA = pa.schema([("category_id", pa.int32()), ("url", pa.string()), ("name", pa.string())])
 
-def get_data(base_url, endpoint, params=None, headers=None):
+# Bronze se particiona por mes: cada corrida solo escribe las particiones de los meses nuevos
+BRONZE_PARTITION = "month"
+# Opciones de escritura de Bronze: row groups acotados para poder recorrerlo por lotes (ver `iter_bronze_batches`)
+BRONZE_WRITER_PROPERTIES = WriterProperties(max_row_group_size=BRONZE_ROW_GROUP_SIZE)
+
+# Motor para construir Silver: "pandas" o "arrow" (sin pasar por pandas)
+SILVER_ENGINE = "arrow"
+# Modo de actualización de Silver: "full" (reescribe todo), "incremental" (MERGE de lo nuevo en Bronze)
+# o "streaming" (reescribe todo procesando Bronze por lotes, con memoria acotada) o "parallel" (reescribe
+# todo procesando cada mes de Bronze en un proceso distinto)
+SILVER_MODE = "incremental"
+# Filas por lote en el modo "streaming": el pico de memoria depende de este valor y del row group de
+# Bronze (BRONZE_ROW_GROUP_SIZE), no del tamaño de Bronze
+STREAM_BATCH_SIZE = 100_000
+# Procesos del modo "parallel": cada uno procesa un mes de Bronze a la vez
+SILVER_WORKERS = os.cpu_count() or 1
+# Clave en la metadata de cada commit de Silver con la versión de Bronze ya procesada
+BRONZE_VERSION_KEY = "bronze_version"
+# Fecha de reemplazo cuando el crimen no tiene resultado
+MISSING_OUTCOME_DATE = "1899-12-31"
+# Grilla espacial de Silver: celdas de GRID_RESOLUTION grados (~550 m de latitud), numeradas
+# por fila de latitud y luego por columna de longitud. Silver se escribe ordenado por celda, así
+# las estadísticas de cada archivo acotan una zona y las consultas por área descartan el resto
+GRID_RESOLUTION = 0.005
+# Si un recuadro abarca más filas de la grilla, se filtra por el rango total de celdas
+MAX_CELL_RANGES = 64
+EARTH_RADIUS_M = 6_371_000
+# Error máximo (grados) admitido al guardar las coordenadas en float32; 1e-5 grados es alrededor de un metro
+COORDINATE_TOLERANCE = 1e-5
+# Tablas de Gold (dentro de GOLD_PATH) y la dimensión que cada una cuenta por mes
+GOLD_DIMENSIONS = {
+    "by_category": "crime_category",
+    "by_street": "street_name",
+    "by_outcome": "outcome_category",
+    "by_cell": "spatial_cell",
+}
+# Clave en la metadata de cada commit de Gold con la versión de Silver ya agregada
+SILVER_VERSION_KEY = "silver_version"
+# Clave en la metadata de cada commit de Silver con la huella de las categorías usadas en el join
+CATEGORIES_KEY = "crime_categories"
+# Clave en la metadata de los MERGE de Silver con los meses que modificaron
+CHANGED_MONTHS_KEY = "changed_months"
+# Columnas por las que filtra `read_crimes` en cada capa (Bronze guarda los campos anidados de la API)
+READ_FILTER_COLUMNS = {
+    "bronze": {"month": "month", "category": "category", "outcome": "outcome_status.category",
+               "latitude": "location.latitude", "longitude": "location.longitude"},
+    "silver": {"month": "crime_month", "category": "crime_category", "outcome": "outcome_category",
+               "latitude": "latitude", "longitude": "longitude"},
+}
+# Operaciones de Delta que reorganizan archivos sin cambiar los datos
+DATA_NEUTRAL_OPERATIONS = {"OPTIMIZE", "VACUUM START", "VACUUM END"}
+# Esquema de la capa Silver, con las columnas en el orden en que se escriben
+SILVER_SCHEMA = pa.schema([
+    ("location_type", pa.string()),
+    ("crime_context", pa.string()),
+    ("crime_persistent_id", pa.string()),
+    ("location_subtype", pa.string()),
+    ("crime_month", pa.timestamp("us")),
+    ("latitude", pa.float32()),
+    ("longitude", pa.float32()),
+    ("street_name", pa.string()),
+    ("outcome_category", pa.string()),
+    ("outcome_date", pa.timestamp("us")),
+    ("crime_category", pa.string()),
+    ("outcome_month_year", pa.string()),
+    ("spatial_cell", pa.int64()),
+])
+SILVER_COLUMNS = SILVER_SCHEMA.names
+# Fotos de las tablas compartidas por las lecturas del pipeline (ver `delta_snapshot.SnapshotCache`)
+table_snapshots = SnapshotCache(SNAPSHOT_CACHE_DIR)
+
+def parse_poly(poly):
     """
-    Realiza una solicitud GET a una API para obtener datos en formato JSON.
+    Convierte un polígono en formato police.uk ("lat,lng:lat,lng:...") en una lista de tuplas.
     """
-    try:
-        url = f"{base_url}/{endpoint}"
-        response = requests.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error en la solicitud: {e}")
-        return None
-    except ValueError:
-        print("Error al procesar la respuesta JSON")
-        return None
+    return [tuple(float(v) for v in point.split(",")) for point in poly.split(":")]
+
+def format_poly(points):
+    """
+    Convierte una lista de tuplas (lat, lng) al formato de polígono de police.uk.
+    """
+    return ":".join(f"{lat:.6f},{lng:.6f}" for lat, lng in points)
+
+def clip_poly(points, lat_min, lat_max, lng_min, lng_max):
+    """
+    Recorta un polígono contra un rectángulo (algoritmo de Sutherland-Hodgman).
+
+    Retorna:
+    - list: Vértices del polígono recortado (vacía si no hay intersección).
+    """
+    def clip(points, inside, intersect):
+        result = []
+        for i, current in enumerate(points):
+            previous = points[i - 1]
+            if inside(current):
+                if not inside(previous):
+                    result.append(intersect(previous, current))
+                result.append(current)
+            elif inside(previous):
+                result.append(intersect(previous, current))
+        return result
+
+    def at_lat(lat):
+        return lambda a, b: (lat, a[1] + (b[1] - a[1]) * (lat - a[0]) / (b[0] - a[0]))
 
-def fetch_crime_categories(base_url, endpoint, months):
+    def at_lng(lng):
+        return lambda a, b: (a[0] + (b[0] - a[0]) * (lng - a[1]) / (b[1] - a[1]), lng)
+
+    for inside, intersect in [
+        (lambda p: p[0] >= lat_min, at_lat(lat_min)),
+        (lambda p: p[0] <= lat_max, at_lat(lat_max)),
+        (lambda p: p[1] >= lng_min, at_lng(lng_min)),
+        (lambda p: p[1] <= lng_max, at_lng(lng_max)),
+    ]:
+        if not points:
+            break
+        points = clip(points, inside, intersect)
+    return points
+
+def split_poly(poly):
+    """
+    Divide un polígono en hasta cuatro polígonos, uno por cuadrante de su bounding box.
+    Los cuadrantes sin intersección con el polígono se descartan.
+    """
+    points = parse_poly(poly)
+    lats = [p[0] for p in points]
+    lngs = [p[1] for p in points]
+    lat_mid = (min(lats) + max(lats)) / 2
+    lng_mid = (min(lngs) + max(lngs)) / 2
+
+    tiles = []
+    for lat_min, lat_max in [(min(lats), lat_mid), (lat_mid, max(lats))]:
+        for lng_min, lng_max in [(min(lngs), lng_mid), (lng_mid, max(lngs))]:
+            clipped = clip_poly(points, lat_min, lat_max, lng_min, lng_max)
+            if len(clipped) >= 3:
+                tiles.append(format_poly(clipped))
+    return tiles
+
+def drop_duplicate_crimes(df):
+    """
+    Elimina los crímenes repetidos por aparecer en el borde de dos polígonos vecinos.
+
+    La clave es el mes junto con `persistent_id` y, cuando viene vacío (por ejemplo en
+    anti-social behaviour), el `id` del registro.
+    """
+    if df.empty:
+        return df
+    key = df["persistent_id"].where(df["persistent_id"].fillna("") != "", df["id"].astype(str))
+    return df.loc[~pd.concat([df["month"], key], axis=1).duplicated()].reset_index(drop=True)
+
+def month_ttl(month, today=None):
+    """
+    Devuelve la validez en cache para los datos de un mes ("YYYY-MM").
+
+    Los meses con más de `CACHE_FROZEN_MONTHS` de antigüedad no vencen (None);
+    los recientes usan `HTTP_CACHE_TTL` porque police.uk todavía puede actualizarlos.
+    """
+    today = today or date.today()
+    year, month_number = (int(v) for v in month.split("-"))
+    age = (today.year - year) * 12 + today.month - month_number
+    return None if age > CACHE_FROZEN_MONTHS else HTTP_CACHE_TTL
+
+def fetch_crime_categories(base_url, endpoint, months, cache=None):
     """
     Obtiene las categorías de crimen para múltiples meses.
+
+    La API devuelve la lista completa en cada mes: se deja una fila por `url`, con el nombre
+    del último mes pedido.
     """
-    all_categories = []
-    for month in months:
-        params = {"date": month}
-        data = get_data(base_url, endpoint, params=params)
-        if data:
-            all_categories.extend(data)
-    
-    return pd.DataFrame(all_categories) if all_categories else pd.DataFrame()
+    with metrics.step("fetch_crime_categories", target=CATEGORIES_PATH, endpoint=endpoint,
+                      months=list(months)) as record:
+        all_categories = []
+        for month in months:
+            params = {"date": month}
+            data = get_data(base_url, endpoint, params=params, cache=cache, ttl=month_ttl(month))
+            if data:
+                all_categories.extend(data)
+        df = deduplicate(pd.DataFrame(all_categories), "url", keep="last") if all_categories else pd.DataFrame()
+        record.update({"rows_in": len(all_categories), "rows_out": len(df)})
+
+    return df.reset_index(drop=True)
 
-def fetch_crime_data(base_url, endpoint, months, area_poly):
+def fetch_crime_data(base_url, endpoint, months, area_poly, max_workers=1, max_rps=MAX_RPS,
+                     max_depth=MAX_TILE_DEPTH, cache=None):
     """
     Obtiene datos de crímenes para múltiples meses y devuelve un DataFrame.
+
+    Parámetros:
+    - max_workers (int): Cantidad de solicitudes en paralelo. Con 1 se piden en secuencia.
+    - max_rps (float, opcional): Tope de solicitudes por segundo contra la API.
+    - max_depth (int): Niveles máximos de subdivisión del polígono.
+    - cache (ResponseCache, opcional): Cache de respuestas; los meses históricos no se vuelven a pedir.
+
+    Si la API rechaza el polígono de un mes por superar el tope de crímenes, se divide en
+    cuadrantes (quadtree) y se vuelven a pedir los pedazos, en paralelo, hasta que entren.
+    Los crímenes repetidos en los bordes de los pedazos se eliminan antes de devolver.
+
+    Todas las solicitudes comparten una misma sesión keep-alive. El resultado es idéntico
+    al del modo secuencial: los meses se concatenan en el orden de `months`.
+    """
+    with metrics.step("fetch_crime_data", target=BRONZE_PATH, endpoint=endpoint, months=list(months)) as record:
+        wait = rate_limiter(max_rps)
+
+        with create_session(max_workers) as session:
+            def fetch_tile(tile):
+                month_index, path, poly = tile
+                month = months[month_index]
+                wait()
+                params = {"date": month, "poly": poly}
+                try:
+                    return get_data(base_url, endpoint, params=params, session=session,
+                                    raise_status=(STATUS_AREA_TOO_LARGE,),
+                                    cache=cache, ttl=month_ttl(month))
+                except requests.exceptions.HTTPError:
+                    return STATUS_AREA_TOO_LARGE
+
+            # Se procesa nivel por nivel: los polígonos rechazados se reemplazan por sus cuadrantes
+            results = []
+            pending = [(i, (), area_poly) for i in range(len(months))]
+            executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+            try:
+                while pending:
+                    responses = executor.map(fetch_tile, pending) if executor else map(fetch_tile, pending)
+                    next_level = []
+                    for (month_index, path, poly), data in zip(pending, responses):
+                        if data != STATUS_AREA_TOO_LARGE:
+                            results.append(((month_index, path), data))
+                        elif len(path) < max_depth:
+                            next_level.extend(
+                                (month_index, path + (q,), tile) for q, tile in enumerate(split_poly(poly))
+                            )
+                        else:
+                            print(f"Polígono demasiado grande para {months[month_index]} aun dividido: {poly}")
+                    pending = next_level
+            finally:
+                if executor:
+                    executor.shutdown()
+
+        all_crimes = []
+        for _, data in sorted(results, key=lambda r: r[0]):
+            if data:
+                all_crimes.extend(data)
+        df = drop_duplicate_crimes(pd.DataFrame(all_crimes)) if all_crimes else pd.DataFrame()
+        record.update({"requests": len(results), "rows_out": len(df), "bytes_out": data_bytes(df)})
+    return df
+
+def ingested_months(path=BRONZE_PATH):
+    """
+    Devuelve los meses ya cargados en Bronze, leídos del log de Delta.
+
+    Si la tabla está particionada por mes alcanza con los valores de partición del log;
+    si es una tabla anterior sin particionar, se lee solo la columna 'month'.
+    """
+    if not DeltaTable.is_deltatable(path):
+        return set()
+    dt = DeltaTable(path)
+    if BRONZE_PARTITION in dt.metadata().partition_columns:
+        return {partition[BRONZE_PARTITION] for partition in dt.partitions()}
+    return set(dt.to_pyarrow_table(columns=[BRONZE_PARTITION])[BRONZE_PARTITION].unique().to_pylist())
+
+def pending_months(months, path=BRONZE_PATH):
+    """
+    Filtra los meses que todavía no están en Bronze.
+
+    Retorna:
+    - list: Meses de `months` que faltan (huecos y meses posteriores a la marca de agua), ordenados.
+    """
+    ingested = ingested_months(path)
+    high_water_mark = max(ingested, default=None)
+    pending = sorted(month for month in set(months) if month not in ingested)
+    print(f"Bronze: último mes cargado {high_water_mark}, meses a pedir {pending}")
+    return pending
+
+def table_size(path, version=None):
+    """
+    Filas y bytes en disco de una versión de una tabla Delta, según su foto (sin leer datos).
+    """
+    _, actions, _ = table_snapshots.load(path, version)
+    return {"rows": pc.sum(actions["num_records"]).as_py() or 0, "bytes": pc.sum(actions["size_bytes"]).as_py() or 0}
+
+def write_bronze(df, path=BRONZE_PATH):
+    """
+    Escribe los crímenes en Bronze reemplazando de forma atómica solo las particiones
+    de los meses presentes en `df`. Volver a cargar un mes no duplica datos.
+
+    La primera vez que se encuentra una tabla sin particionar, se reescribe completa
+    particionada por mes (en un solo commit) conservando los meses que no cambian.
     """
-    all_crimes = []
-    for month in months:
-        params = {"date": month, "poly": area_poly}
-        data = get_data(base_url, endpoint, params=params)
-        if data:
-            all_crimes.extend(data)
-    return pd.DataFrame(all_crimes) if all_crimes else pd.DataFrame()
+    if df.empty:
+        print("Bronze: no hay meses nuevos para escribir")
+        return
+
+    months = sorted(df[BRONZE_PARTITION].unique())
+    if not DeltaTable.is_deltatable(path):
+        with delta_commit("write_bronze", path, df) as commit_options:
+            write_deltalake(path, df, partition_by=[BRONZE_PARTITION], writer_properties=BRONZE_WRITER_PROPERTIES,
+                            **commit_options)
+        return
+
+    dt = DeltaTable(path)
+    schema = pa.schema(dt.schema().to_arrow())
+    data = pa.Table.from_pandas(df.reindex(columns=schema.names), schema=schema, preserve_index=False)
 
+    if BRONZE_PARTITION not in dt.metadata().partition_columns:
+        existing = dt.to_pyarrow_table()
+        existing = existing.filter(pc.invert(pc.is_in(existing[BRONZE_PARTITION], pa.array(months))))
+        data = pa.concat_tables([existing, data])
+        with delta_commit("write_bronze", path, data) as commit_options:
+            write_deltalake(path, data, mode="overwrite", schema_mode="overwrite", partition_by=[BRONZE_PARTITION],
+                            writer_properties=BRONZE_WRITER_PROPERTIES, **commit_options)
+        return
 
-raw__crimes_street = fetch_crime_data(BASE_URL, ENDPOINT_CRIMES_STREET, MONTHS, AREA_POLY)
-raw__crime_categories = fetch_crime_categories(BASE_URL, ENDPOINT_CATEGORIES, MONTHS)
+    months_sql = ", ".join(f"'{month}'" for month in months)
+    with delta_commit("write_bronze", path, data) as commit_options:
+        write_deltalake(path, data, mode="overwrite", predicate=f"{BRONZE_PARTITION} IN ({months_sql})",
+                        writer_properties=BRONZE_WRITER_PROPERTIES, **commit_options)
 
-write_deltalake(BRONZE_PATH, raw__crimes_street)
+def category_lookup(categories):
+    """
+    Tabla de búsqueda de categorías para el join de Silver: una fila por `url` (gana la última),
+    así cada crimen encuentra a lo sumo una categoría.
+
+    Parámetros:
+    - categories (DataFrame o pa.Table): Lista de la API o la dimensión `CATEGORIES_PATH`.
+
+    Retorna:
+    - pa.Table con columnas 'url' y 'name' (string).
+    """
+    if isinstance(categories, pd.DataFrame):
+        categories = pa.Table.from_pandas(categories.reindex(columns=["url", "name"]), preserve_index=False)
+    categories = categories.select(["url", "name"]).cast(pa.schema([("url", pa.string()), ("name", pa.string())]))
+    return deduplicate(categories, "url", keep="last")
+
+def category_digest(lookup):
+    """
+    Huella del contenido de una tabla de `category_lookup`, sin importar el orden de las filas.
+    """
+    pairs = sorted(zip(lookup["url"].to_pylist(), lookup["name"].to_pylist()), key=lambda pair: pair[0] or "")
+    return hashlib.sha256(json.dumps(pairs).encode()).hexdigest()[:16]
+
+def read_crime_categories(path=CATEGORIES_PATH):
+    """
+    Lee la dimensión de categorías, o None si todavía no existe.
+    """
+    if not DeltaTable.is_deltatable(path):
+        return None
+    return DeltaTable(path).to_pyarrow_table().cast(CATEGORIES_SCHEMA).sort_by("category_id")
+
+def update_crime_categories(categories, path=CATEGORIES_PATH):
+    """
+    Actualiza la dimensión de categorías con la lista de la API y escribe una versión nueva
+    solo si la lista cambió.
+
+    Cada categoría conserva su `category_id`; las nuevas reciben el siguiente número libre. Las
+    que la API ya no devuelve se mantienen, porque los crímenes de meses anteriores las usan.
+
+    Retorna:
+    - pa.Table: La dimensión vigente, ordenada por `category_id`.
+    """
+    current = read_crime_categories(path)
+    incoming = category_lookup(categories)
+    if current is None:
+        current = CATEGORIES_SCHEMA.empty_table()
+
+    names = dict(zip(current["url"].to_pylist(), current["name"].to_pylist()))
+    names.update(zip(incoming["url"].to_pylist(), incoming["name"].to_pylist()))
+    ids = dict(zip(current["url"].to_pylist(), current["category_id"].to_pylist()))
+    next_id = max(ids.values(), default=-1) + 1
+    for url in incoming["url"].to_pylist():
+        if url not in ids:
+            ids[url] = next_id
+            next_id += 1
+
+    urls = sorted(ids, key=ids.get)
+    dimension = pa.table([[ids[url] for url in urls], urls, [names[url] for url in urls]], schema=CATEGORIES_SCHEMA)
+    if DeltaTable.is_deltatable(path) and dimension.equals(current):
+        print(f"Categorías: sin cambios ({dimension.num_rows} categorías)")
+        return current
+
+    with delta_commit("write_crime_categories", path, dimension) as commit_options:
+        write_deltalake(path, dimension, mode="overwrite", schema_mode="overwrite",
+                        **commit_options)
+    print(f"Categorías: {dimension.num_rows} categorías, {dimension.num_rows - current.num_rows} nuevas")
+    return dimension
+
+def compare_fetch_modes(base_url, endpoint, months, area_poly, workers=(1, 2, 4, 8), max_rps=MAX_RPS):
+    """
+    Mide el tiempo de `fetch_crime_data` con distinta cantidad de workers y verifica
+    que todos los modos devuelvan exactamente los mismos datos que el secuencial.
+
+    Retorna:
+    - DataFrame con los segundos y la aceleración respecto del modo secuencial.
+    """
+    rows = []
+    baseline = None
+    for n in workers:
+        start = time.perf_counter()
+        df = fetch_crime_data(base_url, endpoint, months, area_poly, max_workers=n, max_rps=max_rps)
+        elapsed = time.perf_counter() - start
+        if baseline is None:
+            baseline = (df, elapsed)
+        rows.append({
+            "max_workers": n,
+            "seconds": round(elapsed, 3),
+            "speedup": round(baseline[1] / elapsed, 2) if elapsed else None,
+            "identical": df.equals(baseline[0]),
+        })
+    return pd.DataFrame(rows)
 
 
 # 🔹 Procesar datos para la capa Silver
-def process_crime_data(df):
+def flatten_crime_structs(table, memory_pool=None):
+    """
+    Extrae los campos anidados de 'location' y 'outcome_status' de una tabla Arrow de Bronze.
+
+    Devuelve los mismos valores que antes se obtenían fila por fila con `apply`: si falta 'location' los
+    campos quedan nulos, y si falta 'outcome_status' la categoría y la fecha quedan en "".
+
+    Parámetros:
+    - table (pa.Table): Filas de Bronze.
+    - memory_pool (pa.MemoryPool, opcional): Pool de Arrow para los resultados. Por defecto, el global.
+
+    Retorna:
+    - dict: Nombre de la columna derivada -> ChunkedArray.
+    """
+    location = table["location"]
+    outcome_status = table["outcome_status"]
+    has_outcome = pc.is_valid(outcome_status, memory_pool=memory_pool)
+
+    def field(column, path):
+        return pc.struct_field(column, path, memory_pool=memory_pool)
+
+    return {
+        "latitude": field(location, "latitude"),
+        "longitude": field(location, "longitude"),
+        "street_name": field(location, ["street", "name"]),
+        "outcome_category": pc.if_else(has_outcome, field(outcome_status, "category"), "", memory_pool=memory_pool),
+        "outcome_date": pc.if_else(has_outcome, field(outcome_status, "date"), "", memory_pool=memory_pool),
+    }
+
+def grid_columns(resolution=GRID_RESOLUTION):
+    """
+    Cantidad de columnas de la grilla (celdas por fila de latitud).
+    """
+    return math.ceil(360 / resolution)
+
+def grid_cell(latitude, longitude, resolution=GRID_RESOLUTION, memory_pool=None):
+    """
+    Calcula la celda de la grilla espacial de cada punto.
+
+    Sirve tanto para arrays de Arrow como para escalares de Python, con la misma aritmética
+    en ambos casos, así la celda de un recuadro de consulta coincide con la guardada en Silver.
+
+    Parámetros:
+    - latitude, longitude (pa.Array, pa.ChunkedArray o float): Coordenadas en grados.
+    - resolution (float): Lado de la celda en grados.
+    - memory_pool (pa.MemoryPool, opcional): Pool de Arrow para los arrays. Por defecto, el global.
+
+    Retorna:
+    - int64 (array o int): fila * grid_columns() + columna. Nulo si falta alguna coordenada.
+    """
+    if not isinstance(latitude, (pa.Array, pa.ChunkedArray)):
+        row = math.floor((float(latitude) + 90) / resolution)
+        col = math.floor((float(longitude) + 180) / resolution)
+        return row * grid_columns(resolution) + col
+    pool = {"memory_pool": memory_pool}
+
+    def index(values, offset):
+        values = pc.add(pc.cast(values, pa.float64(), **pool), offset, **pool)
+        return pc.cast(pc.floor(pc.divide(values, resolution, **pool), **pool), pa.int64(), **pool)
+
+    row = index(latitude, 90.0)
+    col = index(longitude, 180.0)
+    return pc.add(pc.multiply(row, grid_columns(resolution), **pool), col, **pool)
+
+def process_crime_data(df, categories=None):
     """
     Limpia y transforma los datos crudos para almacenarlos en la capa Silver del Lakehouse.
     
     Parámetros:
     - df (DataFrame): Datos sin procesar obtenidos de la capa Bronze.
+    - categories (DataFrame o pa.Table, opcional): Categorías de crimen; por defecto, la dimensión
+      guardada (`read_crime_categories`).
 
     Retorna:
-    - DataFrame limpio y optimizado para la capa Silver.
+    - DataFrame limpio para la capa Silver.
     """
     
     dt = DeltaTable(BRONZE_PATH)
-    df = dt.to_pandas()  # Convertir a Pandas para manipular
-
+    table = dt.to_pyarrow_table()
 
     # Eliminar registros sin ID único (inconsistentes)
-    df = df.dropna(subset=["persistent_id"])
-    
+    table = table.filter(pc.is_valid(table["persistent_id"]))
 
-    # Extraer datos de 'location' y 'outcome_status' de forma eficiente
-    df["latitude"] = df["location"].apply(lambda x: x.get("latitude") if isinstance(x, dict) else None)
-    df["longitude"] = df["location"].apply(lambda x: x.get("longitude") if isinstance(x, dict) else None)
-    df["street_name"] = df["location"].apply(lambda x: x.get("street", {}).get("name") if isinstance(x, dict) else None)
-    df["outcome_category"] = df["outcome_status"].apply(lambda x: x.get("category", "") if isinstance(x, dict) else "")
-    df["outcome_date"] = df["outcome_status"].apply(lambda x: x.get("date", "") if isinstance(x, dict) else "")
+    # Extraer datos de 'location' y 'outcome_status' directamente de las columnas struct de Arrow,
+    # en una sola pasada vectorizada y sin convertir cada fila a un dict de Python
+    df = table.drop_columns(["location", "outcome_status"]).to_pandas()  # Convertir a Pandas para manipular
+    df = df.assign(**{
+        name: column.to_pandas() for name, column in flatten_crime_structs(table).items()
+    })
     
-    # Hacer el merge con la tabla de categorías de crimen
-    df = df.merge(
-    raw__crime_categories, 
-    left_on="category", 
-    right_on="url", 
-    how="left"
-    )
+    # Buscar el nombre de cada categoría por su posición en la tabla de categorías (una fila por url):
+    # a diferencia de un merge, no puede multiplicar filas si la lista trae urls repetidas
+    categories = read_crime_categories() if categories is None else categories
+    if categories is None:
+        raise ValueError(f"No hay categorías de crimen: falta la dimensión {CATEGORIES_PATH} (etapa categories)")
+    lookup = category_lookup(categories)
+    position = pd.Index(lookup["url"].to_pandas()).get_indexer(df["category"])
+    df["name"] = lookup["name"].to_pandas().reindex(position).to_numpy()
 
     # Renombrar columnas
     df = df.rename(columns={
@@ -107,47 +581,825 @@ def process_crime_data(df):
     })
     
     # Eliminar columnas innecesarias
-    df = df.drop(columns=["location", "id", "outcome_status", "category", "url"])
+    df = df.drop(columns=["id", "category"])
 
     # Convertir tipos de datos
     df["crime_month"] = pd.to_datetime(df["crime_month"], format="%Y-%m", errors="coerce")
     # Asegurar que los valores NaN se llenen antes de la conversión
     df["outcome_date"] = df["outcome_date"].astype(str).replace("nan", None)
     # Convertir a datetime y reemplazar NaN con una fecha específica
-    df["outcome_date"] = pd.to_datetime(df["outcome_date"], errors="coerce").fillna(pd.Timestamp("1899-12-31"))
+    df["outcome_date"] = pd.to_datetime(df["outcome_date"], errors="coerce").fillna(pd.Timestamp(MISSING_OUTCOME_DATE))
     # Crear columna con el formato de fecha "M  es-Año" para el outcome_date
     df["outcome_month_year"] = df["outcome_date"].dt.strftime("%b-%y").fillna("")
     # Limpieza de nombres de calles
     df["street_name"] = df["street_name"].str.replace(r"^On or near ", "", regex=True)
 
-    # Convertir a tipos eficientes
-    conversion_mapping = {
-        "crime_category": "category",
-        "crime_persistent_id": "string",
-        "latitude": "float32",
-        "longitude": "float32",
-        "street_name": "category",
-        "location_type": "category",
-        "crime_context": "string",
-        "outcome_category": "category"
-    }
-    
-    # Aplicar conversión solo a las columnas existentes
-    for col, dtype in conversion_mapping.items():
+    # Los tipos de Silver los fija SILVER_SCHEMA al escribir. La única conversión que puede cambiar
+    # valores es la de las coordenadas a float32: se valida con un error de a lo sumo COORDINATE_TOLERANCE
+    for col in ("latitude", "longitude"):
         if col in df.columns:
-            df[col] = df[col].astype(dtype)
+            values = cast_array(pa.array(df[col], pa.string()), pa.float32(), COORDINATE_TOLERANCE, col)
+            df[col] = values.to_numpy(zero_copy_only=False)
 
-    return df
+    # Celda de la grilla, calculada sobre las coordenadas ya convertidas a float32 (las que se guardan)
+    if "latitude" in df.columns and "longitude" in df.columns:
+        cells = grid_cell(pa.array(df["latitude"]), pa.array(df["longitude"]))
+        df["spatial_cell"] = cells.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get).to_numpy()
+
+    # Mismo orden de columnas sin importar dónde deje Delta la columna de partición
+    return df[[col for col in SILVER_COLUMNS if col in df.columns]]
+
+def parse_month(values, memory_pool=None):
+    """
+    Convierte strings "YYYY-MM" (o "YYYY-MM-DD") de Arrow a timestamp; los inválidos quedan nulos.
+    """
+    pool = {"memory_pool": memory_pool}
+    is_month = pc.equal(pc.utf8_length(values, **pool), 7, **pool)
+    values = pc.if_else(is_month, pc.binary_join_element_wise(values, "-01", "", **pool), values, **pool)
+    return pc.strptime(values, format="%Y-%m-%d", unit="us", error_is_null=True, **pool)
+
+def process_crime_data_arrow(categories, bronze=None, memory_pool=None):
+    """
+    Versión de `process_crime_data` que hace toda la transformación sobre tablas Arrow,
+    sin copiar las columnas a pandas y de vuelta.
+
+    Parámetros:
+    - categories (DataFrame o pa.Table): Categorías de crimen con columnas 'url' y 'name'.
+    - bronze (pa.Table, opcional): Filas de Bronze a procesar. Por defecto, toda la tabla.
+    - memory_pool (pa.MemoryPool, opcional): Pool de Arrow para las columnas calculadas. Por defecto, el global.
+
+    Retorna:
+    - pa.Table con el mismo esquema que escribe el motor pandas en la capa Silver.
+    """
+    categories = category_lookup(categories)
+
+    pool = {"memory_pool": memory_pool}
+
+    table = DeltaTable(BRONZE_PATH).to_pyarrow_table() if bronze is None else bronze
+
+    # Eliminar registros sin ID único (inconsistentes)
+    table = pc.filter(table, pc.is_valid(table["persistent_id"], **pool), **pool)
+
+    # Extraer los campos anidados y descartar las columnas struct
+    for name, column in flatten_crime_structs(table, memory_pool).items():
+        table = table.append_column(name, column)
+    table = table.drop_columns(["location", "outcome_status"])
+
+    # Join con las categorías como búsqueda: la posición de cada url en la tabla de categorías es el
+    # índice de un array de diccionario sobre sus nombres. No cambia la cantidad ni el orden de las filas
+    position = pc.index_in(pc.cast(table["category"], pa.string(), **pool), value_set=categories["url"], **pool)
+    category_names = categories["name"].combine_chunks(**pool)
+    name = pa.chunked_array(
+        [pa.DictionaryArray.from_arrays(chunk, category_names) for chunk in position.chunks],
+        pa.dictionary(pa.int32(), pa.string()),
+    )
+    table = table.append_column("name", name)
+
+    # Renombrar columnas
+    table = table.rename_columns({
+        "persistent_id": "crime_persistent_id",
+        "month": "crime_month",
+        "context": "crime_context",
+        "name": "crime_category",
+    })
+
+    # Fechas, limpieza de calles y tipos eficientes (las categorías se codifican como diccionario)
+    missing_outcome = pa.scalar(pd.Timestamp(MISSING_OUTCOME_DATE), pa.timestamp("us"))
+    outcome_date = pc.coalesce(parse_month(table["outcome_date"], memory_pool), missing_outcome, **pool)
+    street_name = pc.replace_substring_regex(table["street_name"], pattern="^On or near ", replacement="", **pool)
+    columns = {
+        "location_type": pc.dictionary_encode(table["location_type"], **pool),
+        "crime_context": table["crime_context"],
+        "crime_persistent_id": table["crime_persistent_id"],
+        "location_subtype": table["location_subtype"],
+        "crime_month": parse_month(table["crime_month"], memory_pool),
+        # Coordenadas en float32 (SILVER_SCHEMA), con un error de a lo sumo COORDINATE_TOLERANCE
+        "latitude": cast_array(table["latitude"], pa.float32(), COORDINATE_TOLERANCE, "latitude", memory_pool),
+        "longitude": cast_array(table["longitude"], pa.float32(), COORDINATE_TOLERANCE, "longitude", memory_pool),
+        "street_name": pc.dictionary_encode(street_name, **pool),
+        "outcome_category": pc.dictionary_encode(table["outcome_category"], **pool),
+        "outcome_date": outcome_date,
+        "crime_category": table["crime_category"],
+        "outcome_month_year": pc.strftime(outcome_date, format="%b-%y", **pool),
+    }
+    columns["spatial_cell"] = grid_cell(columns["latitude"], columns["longitude"], memory_pool=memory_pool)
+    return pa.table([columns[name] for name in SILVER_COLUMNS], names=SILVER_COLUMNS)
+
+def silver_metadata(bronze_version, categories):
+    """
+    Metadata de un commit de Silver: la versión de Bronze procesada y la huella de las
+    categorías (una tabla de `category_lookup`) con que se hizo el join.
+    """
+    return {BRONZE_VERSION_KEY: str(bronze_version), CATEGORIES_KEY: category_digest(categories)}
+
+def build_silver(categories, engine=SILVER_ENGINE):
+    """
+    Construye la capa Silver con el motor elegido y la escribe en `SILVER_PATH`.
 
-processed_crimes_df = process_crime_data(raw__crimes_street)
-write_deltalake(SILVER_PATH, processed_crimes_df, mode="overwrite")
+    Parámetros:
+    - categories (DataFrame o pa.Table): Categorías de crimen (lista de la API o la dimensión).
+    - engine (str): "pandas" o "arrow".
+
+    Retorna:
+    - dict: Tiempo de pared y pico de memoria de la transformación y la escritura.
+    """
+    categories = category_lookup(categories)
+    with measure() as stats:
+        # La versión se toma antes de leer: si Bronze cambia mientras tanto, se reprocesa de más, nunca de menos
+        bronze_version = DeltaTable(BRONZE_PATH).version()
+        bronze_size = table_size(BRONZE_PATH, bronze_version)
+        with metrics.step("process_crime_data", target=SILVER_PATH, engine=engine, bronze_version=bronze_version,
+                          rows_in=bronze_size["rows"], bytes_in=bronze_size["bytes"]) as record:
+            if engine == "arrow":
+                silver = process_crime_data_arrow(categories)
+            elif engine == "pandas":
+                silver = process_crime_data(None, categories)
+            else:
+                raise ValueError(f"Motor desconocido: {engine}")
+            # Agrupar por mes y celda: cada archivo (y row group) de Silver cubre una zona acotada
+            if engine == "arrow":
+                silver = silver.sort_by([("crime_month", "ascending"), ("spatial_cell", "ascending")])
+            else:
+                silver = silver.sort_values(["crime_month", "spatial_cell"], kind="stable", ignore_index=True)
+                # Los tipos en memoria los elige el optimizador; en disco se respeta el esquema de Silver
+                silver = pa.Table.from_pandas(silver, preserve_index=False).cast(SILVER_SCHEMA)
+            record.update({"rows_out": silver.num_rows, "bytes_out": silver.nbytes})
+        with delta_commit("write_silver", SILVER_PATH, silver,
+                          metadata=silver_metadata(bronze_version, categories)) as commit_options:
+            write_deltalake(SILVER_PATH, silver, mode="overwrite", schema_mode="overwrite",
+                            **commit_options)
+
+    stats.update({"engine": engine, "rows": len(silver)})
+    print(f"Silver ({engine}): {stats}")
+    return stats
+
+def iter_bronze_batches(path=BRONZE_PATH, batch_size=STREAM_BATCH_SIZE, memory_pool=None):
+    """
+    Recorre los archivos activos de una tabla Delta en lotes de a lo sumo `batch_size` filas.
+
+    Cada archivo parquet se lee de forma sincrónica, lote a lote, y se le agregan las
+    columnas de partición. A diferencia del scanner de `to_pyarrow_dataset`, que lee por
+    adelantado, la memoria no crece con la cantidad de archivos. Parquet se lee de a un row
+    group: la memoria depende del mayor entre `batch_size` y el row group de los archivos
+    (`BRONZE_ROW_GROUP_SIZE` en lo que escribe `write_bronze`), no del tamaño de cada archivo.
+
+    La tabla se abre al llamar a la función (no al consumir el generador) y los archivos se
+    leen con el filesystem de pyarrow, para que el generador pueda recorrerse desde dentro
+    de `write_deltalake`.
+
+    Parámetros:
+    - path (str): Ruta de la tabla Delta.
+    - batch_size (int): Filas por lote.
+    - memory_pool (pa.MemoryPool, opcional): Pool de Arrow para los lotes leídos. Por defecto, el global.
+
+    Retorna:
+    - generator: pa.Table por lote.
+    """
+    dt = DeltaTable(path)
+    dataset = dt.to_pyarrow_dataset()
+    fragments = list(dataset.get_fragments())
+    filesystem, root = pafs.FileSystem.from_uri(dt.table_uri)
+
+    # Sin `pre_buffer`: el scanner cargaría de entrada todos los row groups del archivo, no solo el que lee
+    parquet = ds.ParquetFileFormat(default_fragment_scan_options=ds.ParquetFragmentScanOptions(pre_buffer=False))
+
+    def batches():
+        for fragment in fragments:
+            partition = ds.get_partition_keys(fragment.partition_expression)
+            file = parquet.make_fragment(f"{root.rstrip('/')}/{fragment.path}", filesystem)
+            # Sin hilos ni lectura por adelantado: un lote por vez, como `ParquetFile.iter_batches`
+            scanner = ds.Scanner.from_fragment(file, batch_size=batch_size, batch_readahead=0, fragment_readahead=0,
+                                               use_threads=False, memory_pool=memory_pool)
+            for batch in scanner.to_batches():
+                table = pa.Table.from_batches([batch])
+                for name, value in partition.items():
+                    field = dataset.schema.field(name)
+                    table = table.append_column(field, pa.array([value] * table.num_rows, field.type,
+                                                                memory_pool=memory_pool))
+                yield table
+
+    return batches()
+
+def process_crime_data_streaming(categories, batch_size=STREAM_BATCH_SIZE, bronze_path=BRONZE_PATH,
+                                 silver_path=SILVER_PATH):
+    """
+    Reconstruye Silver recorriendo Bronze en lotes de `batch_size` filas.
+
+    Cada lote pasa por la misma limpieza y el mismo join de categorías que el motor Arrow y
+    se entrega enseguida al escritor de Delta, que va generando los archivos de Silver a
+    medida que llegan los lotes y publica todo en un único commit. El pico de memoria queda
+    acotado por el tamaño del lote y no por el de la tabla.
+
+    Retorna:
+    - dict: Tiempo de pared, pico de memoria y filas escritas.
+    """
+    categories = category_lookup(categories)
+    rows = [0]
+    # El pool por defecto de Arrow (mimalloc) retiene la memoria de los lotes ya procesados y
+    # la RSS crecería con la tabla; con el allocator del sistema se devuelve lote a lote.
+    # Se pasa a cada lectura y cálculo, sin cambiar el pool global del proceso
+    pool = pa.system_memory_pool()
+
+    with measure() as stats:
+        bronze_version = DeltaTable(bronze_path).version()
+        bronze_size = table_size(bronze_path, bronze_version)
+        bronze_batches = iter_bronze_batches(bronze_path, batch_size, memory_pool=pool)
+
+        def silver_batches():
+            for batch in bronze_batches:
+                if batch.num_rows:
+                    silver = process_crime_data_arrow(categories, batch, memory_pool=pool)
+                    silver = pa.table([pc.cast(silver[field.name], field.type, memory_pool=pool)
+                                       for field in SILVER_SCHEMA], schema=SILVER_SCHEMA)
+                    order = pc.sort_indices(silver["spatial_cell"], memory_pool=pool)
+                    silver = pc.take(silver, order, memory_pool=pool)
+                    rows[0] += silver.num_rows
+                    yield from silver.to_batches()
+
+        # La transformación corre dentro de la escritura: se mide como un solo paso
+        commit = delta_commit("process_crime_data_streaming", silver_path,
+                              metadata=silver_metadata(bronze_version, categories), batch_size=batch_size,
+                              rows_in=bronze_size["rows"], bytes_in=bronze_size["bytes"])
+        with commit as commit_options:
+            # El escritor acumula un row group entero antes de codificarlo: se acota al tamaño del lote
+            write_deltalake(
+                silver_path, pa.RecordBatchReader.from_batches(SILVER_SCHEMA, silver_batches()), mode="overwrite",
+                schema_mode="overwrite", writer_properties=WriterProperties(max_row_group_size=batch_size),
+                **commit_options,
+            )
+
+    stats.update({"mode": "streaming", "batch_size": batch_size, "rows": rows[0]})
+    print(f"Silver (streaming): {stats}")
+    return stats
+
+def benchmark_streaming_memory(categories, sizes=(200_000, 2_000_000), batch_size=STREAM_BATCH_SIZE):
+    """
+    Comprueba que el pico de memoria del modo "streaming" no crece con el tamaño de Bronze.
+
+    Para cada tamaño arma un Bronze sintético temporal con `write_fake_crimes` (un archivo por
+    mes con row groups de `BRONZE_ROW_GROUP_SIZE`, como `write_bronze`) y lo procesa con
+    `process_crime_data_streaming` hacia un Silver temporal, en un proceso nuevo.
+
+    Retorna:
+    - DataFrame con filas procesadas, tiempo y pico de memoria por tamaño.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            bronze_path = os.path.join(tmp, f"bronze_{size}")
+            silver_path = os.path.join(tmp, f"silver_{size}")
+            # Cada paso corre en un proceso nuevo: la memoria que retiene la generación de los datos
+            # (o el tamaño anterior) no se confunde con la del modo "streaming"
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                executor.submit(write_fake_crimes, size, bronze_path).result()
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                stats = executor.submit(process_crime_data_streaming, categories, batch_size, bronze_path,
+                                        silver_path).result()
+            results.append(stats)
+    return pd.DataFrame(results)
+
+def init_silver_worker(categories):
+    """
+    Inicializa un proceso del modo "parallel" con su copia de la tabla de categorías, que se
+    envía una sola vez por proceso y no con cada mes.
+    """
+    global silver_worker_categories
+    silver_worker_categories = categories
+
+def process_silver_month(bronze_path, bronze_version, month, staging_path):
+    """
+    Procesa un mes de Bronze en un proceso del modo "parallel" y escribe el resultado en una
+    tabla Delta temporal.
 
-processed_crimes_df
+    Se escribe con `write_deltalake` para que los archivos tengan las mismas estadísticas que
+    el resto de Silver; el proceso principal después los mueve a Silver y los publica.
 
+    Retorna:
+    - list: Acciones "add" del log de la tabla temporal (un dict por archivo).
+    """
+    dt = DeltaTable(bronze_path, version=bronze_version)
+    bronze = dt.to_pyarrow_dataset().to_table(filter=ds.field(BRONZE_PARTITION) == month)
+    with metrics.step("process_silver_month", month=month, rows_in=bronze.num_rows,
+                      bytes_in=bronze.nbytes) as record:
+        silver = process_crime_data_arrow(silver_worker_categories, bronze).cast(SILVER_SCHEMA).sort_by("spatial_cell")
+        record.update({"rows_out": silver.num_rows, "bytes_out": silver.nbytes})
+    write_deltalake(staging_path, silver, mode="overwrite")
+
+    actions = []
+    with open(os.path.join(staging_path, "_delta_log", f"{0:020d}.json")) as f:
+        for line in f:
+            action = json.loads(line)
+            if "add" in action:
+                actions.append(action["add"])
+    return actions
+
+def process_crime_data_parallel(categories, workers=SILVER_WORKERS, bronze_path=BRONZE_PATH,
+                                silver_path=SILVER_PATH):
+    """
+    Reconstruye Silver procesando cada mes de Bronze en un proceso distinto.
+
+    Los meses son independientes salvo por el join con las categorías, que es chico y se copia
+    a cada proceso al iniciarlo. Cada proceso escribe los archivos de su mes y al final todos se
+    publican en Silver con un único commit (una sobrescritura atómica): si algún mes falla, Silver
+    no cambia. El tiempo de pared baja aproximadamente con la cantidad de núcleos, hasta un
+    proceso por mes.
+
+    Retorna:
+    - dict: Tiempo de pared, pico de memoria (del proceso principal), procesos y filas escritas.
+    """
+    categories = category_lookup(categories)
+
+    with measure() as stats:
+        bronze_version = DeltaTable(bronze_path).version()
+        bronze_size = table_size(bronze_path, bronze_version)
+        months = sorted(ingested_months(bronze_path))
+        workers = max(1, min(workers, len(months)))
+        os.makedirs(silver_path, exist_ok=True)
+
+        # Las tablas temporales quedan dentro de Silver, así mover los archivos no copia datos
+        with tempfile.TemporaryDirectory(dir=silver_path, prefix="_staging_") as staging:
+            # "spawn": el proceso principal ya tiene hilos de Delta/Arrow andando y no es seguro hacer fork
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=init_silver_worker, initargs=(categories,)) as executor:
+                futures = [
+                    executor.submit(process_silver_month, bronze_path, bronze_version, month,
+                                    os.path.join(staging, f"month={month}"))
+                    for month in months
+                ]
+                month_actions = [(month, future.result()) for month, future in zip(months, futures)]
+
+            actions = []
+            for month, adds in month_actions:
+                for add in adds:
+                    os.replace(os.path.join(staging, f"month={month}", add["path"]),
+                               os.path.join(silver_path, add["path"]))
+                    actions.append(AddAction(add["path"], add["size"], {}, add["modificationTime"], True, add["stats"]))
+
+        commit = delta_commit("process_crime_data_parallel", silver_path,
+                              metadata=silver_metadata(bronze_version, categories), workers=workers,
+                              rows_in=bronze_size["rows"], bytes_in=bronze_size["bytes"])
+        with commit as commit_options:
+            create_table_with_add_actions(silver_path, Schema.from_arrow(SILVER_SCHEMA), actions, mode="overwrite",
+                                          **commit_options)
+
+    rows = sum(json.loads(action.stats)["numRecords"] for action in actions)
+    stats.update({"mode": "parallel", "workers": workers, "months": len(months), "rows": rows})
+    print(f"Silver (parallel): {stats}")
+    return stats
+
+def compare_silver_parallelism(categories, workers=(1, 2, 4, 8, 16)):
+    """
+    Reconstruye Silver en una tabla temporal con distinta cantidad de procesos para ver cómo
+    escala el modo "parallel" con los núcleos disponibles.
+
+    Retorna:
+    - DataFrame con una fila por cantidad de procesos.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in workers:
+            silver_path = os.path.join(tmp, f"silver_{count}")
+            results.append(process_crime_data_parallel(categories, count, silver_path=silver_path))
+    return pd.DataFrame(results)
 
+def compare_silver_engines(categories):
+    """
+    Corre la transformación Bronze -> Silver con ambos motores (sin escribir) y compara
+    tiempo de pared y pico de memoria, para elegir el motor de cada ejecución.
+
+    Retorna:
+    - DataFrame con una fila por motor.
+    """
+    rows = []
+    for engine, transform in [("pandas", lambda: process_crime_data(None, categories)),
+                              ("arrow", lambda: process_crime_data_arrow(categories))]:
+        with measure() as stats:
+            rows.append({"engine": engine, "rows": len(transform())})
+        rows[-1].update(stats)
+    return pd.DataFrame(rows)
+
+def consumed_version(path=SILVER_PATH, key=BRONZE_VERSION_KEY):
+    """
+    Devuelve la última versión de la capa anterior procesada en una tabla, según la metadata
+    de sus commits (por defecto, la versión de Bronze procesada en Silver).
 
+    Retorna:
+    - int o None: None si la tabla no existe o ningún commit registró la versión.
+    """
+    value = commit_value(path, key)
+    return None if value is None else int(value)
+
+def bronze_rows_since(version, path=BRONZE_PATH):
+    """
+    Lee solo las filas de los archivos de Bronze con datos nuevos desde `version`.
+
+    Recorre en el log de Delta los commits posteriores a `version` y junta los archivos que
+    agregaron con `dataChange`; los commits que solo reorganizan archivos (OPTIMIZE, como la
+    compactación de `crimes_maintenance`, y VACUUM) no cuentan, salvo que compacten archivos con
+    datos nuevos: entonces los que escriben los reemplazan. De esos archivos se leen los que
+    siguen activos, así que no se lee ningún parquet que ya se haya procesado.
+
+    Retorna:
+    - tuple: (pa.Table con las filas nuevas, versión actual de Bronze).
+    """
+    dt = DeltaTable(path)
+    added = set()
+    for commit_version in range(version + 1, dt.version() + 1):
+        with open(os.path.join(path, "_delta_log", f"{commit_version:020d}.json")) as f:
+            actions = [json.loads(line) for line in f if line.strip()]
+        operation = next((action["commitInfo"].get("operation") for action in actions if "commitInfo" in action), None)
+        if operation in DATA_NEUTRAL_OPERATIONS:
+            removed = {unquote(action["remove"]["path"]) for action in actions if "remove" in action}
+            if removed & added:
+                added.update(unquote(action["add"]["path"]) for action in actions if "add" in action)
+            continue
+        added.update(unquote(action["add"]["path"]) for action in actions
+                     if "add" in action and action["add"].get("dataChange", True))
+    dataset = dt.to_pyarrow_dataset()
+    fragments = [fragment for fragment in dataset.get_fragments() if fragment.path in added]
+    new_rows = ds.FileSystemDataset(fragments, dataset.schema, dataset.format, dataset.filesystem).to_table()
+    return new_rows, dt.version()
+
+def upsert_silver(categories):
+    """
+    Actualiza Silver de forma incremental: procesa solo las filas de Bronze agregadas desde
+    la última versión consumida y las integra con MERGE sobre `crime_persistent_id`.
+
+    Los crímenes sin `persistent_id` (por ejemplo anti-social behaviour) no tienen clave: se
+    insertan de nuevo y se borran los que había en Silver para los mismos meses, ya que cada
+    partición de Bronze trae el mes completo. Todo ocurre en un único commit, que registra
+    en su metadata la versión de Bronze consumida.
+
+    Si Silver no existe, no tiene registrada una versión de Bronze, le faltan columnas del
+    esquema actual o se armó con otras categorías (ver `CATEGORIES_KEY`), se reconstruye completa.
+    """
+    categories = category_lookup(categories)
+    consumed = consumed_version()
+    if (
+        consumed is None
+        or set(SILVER_COLUMNS) - set(pa.schema(DeltaTable(SILVER_PATH).schema().to_arrow()).names)
+        or commit_value(SILVER_PATH, CATEGORIES_KEY) != category_digest(categories)
+    ):
+        return build_silver(categories)
 
+    with measure() as stats:
+        bronze, bronze_version = bronze_rows_since(consumed)
+        if bronze_version == consumed or bronze.num_rows == 0:
+            print(f"Silver: sin cambios en Bronze desde la versión {consumed}")
+            return stats
+
+        silver = DeltaTable(SILVER_PATH)
+        # Los crímenes sin clave se deduplican por el `id` de Bronze, antes de que la transformación lo
+        # descarte: dos crímenes distintos pueden coincidir en todas las columnas de Silver (la ubicación
+        # se ajusta a puntos de la calle), así que deduplicar por fila completa los uniría
+        keyless = pc.fill_null(pc.equal(bronze["persistent_id"], ""), False)
+        bronze = pa.concat_tables([
+            bronze.filter(pc.invert(keyless)),
+            deduplicate(bronze.filter(keyless), "id", keep="last"),
+        ])
+        step = metrics.step("process_crime_data", target=SILVER_PATH, engine="arrow", mode="incremental",
+                            bronze_version=bronze_version, rows_in=bronze.num_rows, bytes_in=bronze.nbytes)
+        with step as record:
+            increment = process_crime_data_arrow(categories, bronze)
+            record.update({"rows_out": increment.num_rows, "bytes_out": increment.nbytes})
+        # Una fila por crimen, con una pasada de hash y sin ordenar: de cada clave queda el registro del
+        # mes más reciente (ante un empate, el último)
+        keyed = pc.fill_null(pc.not_equal(increment["crime_persistent_id"], ""), False)
+        increment = pa.concat_tables([
+            deduplicate(increment.filter(keyed), "crime_persistent_id", keep="latest", by="crime_month"),
+            increment.filter(pc.invert(keyed)),
+        ])
+        source = increment.cast(pa.schema(silver.schema().to_arrow()))
+        source = source.sort_by([("crime_month", "ascending"), ("spatial_cell", "ascending")])
+        months = sorted(set(pc.strftime(source["crime_month"], format="%Y-%m-%d %H:%M:%S").to_pylist()))
+        months_sql = ", ".join(f"'{month}'" for month in months)
+
+        metadata = {**silver_metadata(bronze_version, categories), CHANGED_MONTHS_KEY: ",".join(months)}
+        with delta_commit("merge_silver", SILVER_PATH, source, metadata=metadata) as commit_options:
+            (
+                silver.merge(
+                    source=source,
+                    source_alias="src",
+                    target_alias="tgt",
+                    predicate="tgt.crime_persistent_id = src.crime_persistent_id AND src.crime_persistent_id <> ''",
+                    **commit_options,
+                )
+                .when_matched_update(updates={col: f"src.{col}" for col in SILVER_COLUMNS})
+                .when_not_matched_insert_all()
+                .when_not_matched_by_source_delete(
+                    predicate=f"tgt.crime_persistent_id = '' AND tgt.crime_month IN ({months_sql})"
+                )
+                .execute()
+            )
+
+    stats.update({"mode": "incremental", "rows": source.num_rows, "bronze_version": bronze_version})
+    print(f"Silver (incremental): {stats}")
+    return stats
+
+def cell_ranges(lat_min, lng_min, lat_max, lng_max, resolution=GRID_RESOLUTION):
+    """
+    Rangos de celdas de la grilla que cubren un recuadro: uno por fila de latitud.
+
+    Retorna:
+    - list: Tuplas (primera_celda, última_celda), ambas inclusive.
+    """
+    first = grid_cell(lat_min, lng_min, resolution)
+    last = grid_cell(lat_max, lng_max, resolution)
+    columns = grid_columns(resolution)
+    first_row, first_col = divmod(first, columns)
+    last_row, last_col = divmod(last, columns)
+    if last_row - first_row >= MAX_CELL_RANGES:
+        return [(first, last)]
+    return [(row * columns + first_col, row * columns + last_col) for row in range(first_row, last_row + 1)]
+
+def crimes_in_bbox(lat_min, lng_min, lat_max, lng_max, columns=None, path=SILVER_PATH):
+    """
+    Devuelve los crímenes de Silver dentro de un recuadro (bordes incluidos).
+
+    Primero se descartan archivos y row groups con las estadísticas de `spatial_cell`,
+    `latitude` y `longitude` (log de Delta y parquet); recién después se filtra fila a fila.
+
+    Parámetros:
+    - lat_min, lng_min, lat_max, lng_max (float): Esquinas del recuadro en grados.
+    - columns (list, opcional): Columnas a devolver. Por defecto, todas.
+    - path (str): Ruta de la tabla Silver.
+
+    Retorna:
+    - pa.Table con los crímenes del recuadro.
+    """
+    ranges = cell_ranges(lat_min, lng_min, lat_max, lng_max)
+    cell = ds.field("spatial_cell")
+    cell_filter = None
+    for first, last in ranges:
+        expression = (cell >= first) & (cell <= last)
+        cell_filter = expression if cell_filter is None else cell_filter | expression
+    # Los límites en float32 solo se usan para descartar archivos: el filtro exacto va después
+    prune_filter = (
+        (cell >= ranges[0][0]) & (cell <= ranges[-1][1]) & cell_filter
+        & (ds.field("latitude") >= pa.scalar(lat_min, pa.float32()))
+        & (ds.field("latitude") <= pa.scalar(lat_max, pa.float32()))
+        & (ds.field("longitude") >= pa.scalar(lng_min, pa.float32()))
+        & (ds.field("longitude") <= pa.scalar(lng_max, pa.float32()))
+    )
+    read_columns = None if columns is None else list(dict.fromkeys([*columns, "latitude", "longitude"]))
+    table = DeltaTable(path).to_pyarrow_dataset().to_table(columns=read_columns, filter=prune_filter)
+
+    latitude = pc.cast(table["latitude"], pa.float64())
+    longitude = pc.cast(table["longitude"], pa.float64())
+    inside = pc.and_(
+        pc.and_(pc.greater_equal(latitude, lat_min), pc.less_equal(latitude, lat_max)),
+        pc.and_(pc.greater_equal(longitude, lng_min), pc.less_equal(longitude, lng_max)),
+    )
+    table = table.filter(inside)
+    return table if columns is None else table.select(columns)
+
+def crimes_near(lat, lng, radius_m, columns=None, path=SILVER_PATH):
+    """
+    Devuelve los crímenes de Silver a menos de `radius_m` metros de un punto, del más cercano
+    al más lejano, con la distancia en la columna `distance_m`.
+
+    Se consulta el recuadro que contiene al círculo con `crimes_in_bbox` y sobre ese
+    resultado se calcula la distancia exacta (haversine).
+    """
+    lat_delta = math.degrees(radius_m / EARTH_RADIUS_M)
+    lng_delta = lat_delta / max(math.cos(math.radians(lat)), 1e-6)
+    read_columns = None if columns is None else list(dict.fromkeys([*columns, "latitude", "longitude"]))
+    table = crimes_in_bbox(lat - lat_delta, lng - lng_delta, lat + lat_delta, lng + lng_delta,
+                           columns=read_columns, path=path)
+
+    phi = pc.multiply(pc.cast(table["latitude"], pa.float64()), math.pi / 180)
+    lam = pc.multiply(pc.cast(table["longitude"], pa.float64()), math.pi / 180)
+    half_dphi = pc.sin(pc.divide(pc.subtract(phi, math.radians(lat)), 2))
+    half_dlam = pc.sin(pc.divide(pc.subtract(lam, math.radians(lng)), 2))
+    a = pc.add(
+        pc.multiply(half_dphi, half_dphi),
+        pc.multiply(pc.multiply(pc.cos(phi), math.cos(math.radians(lat))), pc.multiply(half_dlam, half_dlam)),
+    )
+    distance = pc.multiply(pc.asin(pc.sqrt(pc.min_element_wise(a, 1.0))), 2 * EARTH_RADIUS_M)
+
+    table = table.append_column("distance_m", distance)
+    table = table.filter(pc.less_equal(table["distance_m"], radius_m)).sort_by("distance_m")
+    return table if columns is None else table.select([*columns, "distance_m"])
+
+def file_may_match(actions, column, low, high):
+    """
+    Máscara de los archivos (acciones "add" del log, aplanadas) que pueden tener valores de
+    `column` entre `low` y `high`, según el valor de partición o el mínimo y máximo del archivo.
+
+    Los archivos sin estadísticas se conservan, igual que cuando el tipo de las estadísticas no
+    se puede comparar con los límites (por ejemplo, coordenadas guardadas como texto en Bronze).
+    """
+    keep_all = pa.array([True] * actions.num_rows)
+    if f"partition.{column}" in actions.column_names:
+        minimum = maximum = actions[f"partition.{column}"]
+    elif f"min.{column}" in actions.column_names:
+        minimum, maximum = actions[f"min.{column}"], actions[f"max.{column}"]
+    else:
+        return keep_all
+    try:
+        overlaps = pc.and_(pc.greater_equal(maximum, low), pc.less_equal(minimum, high))
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+        return keep_all
+    return pc.fill_null(overlaps, True)
+
+def read_crimes(path=SILVER_PATH, columns=None, months=None, categories=None, outcomes=None, bbox=None, version=None):
+    """
+    Lee una tabla de crímenes (Bronze o Silver) leyendo solo las columnas y los archivos necesarios.
+
+    Antes de abrir un parquet se descartan, con la foto del log de Delta (`table_snapshots`), los
+    archivos cuyos valores de partición o estadísticas (mínimo y máximo) no pueden cumplir los
+    filtros. Los archivos que quedan se leen con el filtro completo, que además descarta row
+    groups, y solo con `columns`.
+
+    Parámetros:
+    - path (str): Ruta de la tabla de Bronze o de Silver.
+    - columns (list, opcional): Columnas a devolver. Por defecto, todas.
+    - months (list, opcional): Meses "YYYY-MM".
+    - categories (list, opcional): Categorías de crimen, como están en la tabla (url en Bronze,
+      nombre en Silver).
+    - outcomes (list, opcional): Categorías de resultado.
+    - bbox (tuple, opcional): Recuadro (lat_min, lng_min, lat_max, lng_max) en grados, bordes incluidos.
+    - version (int, opcional): Versión de la tabla a leer.
+
+    Retorna:
+    - (pa.Table, dict): Los crímenes y un reporte con archivos y bytes totales, leídos y
+      descartados, filas leídas y devueltas y segundos.
+    """
+    start = time.perf_counter()
+    version, actions, schema = table_snapshots.load(path, version)
+    layer = "silver" if "crime_month" in schema.names else "bronze"
+    fields = READ_FILTER_COLUMNS[layer]
+
+    def field(name):
+        return ds.field(*fields[name].split("."))
+
+    # Cada filtro: columna, rangos (low, high) que puede tener un archivo y expresión fila a fila
+    filters = []
+    if months is not None:
+        values = pa.array(sorted(months), pa.string())
+        if layer == "silver":
+            values = parse_month(values)
+        filters.append(("month", [(value, value) for value in values], field("month").isin(values)))
+    for name, values in (("category", categories), ("outcome", outcomes)):
+        if values is not None:
+            values = pa.array(sorted(values), pa.string())
+            filters.append((name, [(value, value) for value in values], field(name).isin(values)))
+    if bbox is not None:
+        lat_min, lng_min, lat_max, lng_max = bbox
+        for name, low, high in (("latitude", lat_min, lat_max), ("longitude", lng_min, lng_max)):
+            value = field(name).cast(pa.float64())
+            filters.append((name, [(low, high)], (value >= low) & (value <= high)))
+
+    keep = pa.array([True] * actions.num_rows)
+    expression = None
+    for name, ranges, row_filter in filters:
+        matches = None
+        for low, high in ranges:
+            match = file_may_match(actions, fields[name], low, high)
+            matches = match if matches is None else pc.or_(matches, match)
+        keep = pc.and_(keep, matches)
+        expression = row_filter if expression is None else expression & row_filter
+
+    kept = actions.filter(keep)
+    table = snapshot_dataset(path, kept, schema).to_table(columns=columns, filter=expression)
+
+    total_bytes = pc.sum(actions["size_bytes"]).as_py() or 0
+    read_bytes = pc.sum(kept["size_bytes"]).as_py() or 0
+    report = {
+        "layer": layer,
+        "version": version,
+        "files": actions.num_rows,
+        "files_read": kept.num_rows,
+        "files_skipped": actions.num_rows - kept.num_rows,
+        "bytes": total_bytes,
+        "bytes_read": read_bytes,
+        "bytes_skipped": total_bytes - read_bytes,
+        "rows_scanned": pc.sum(kept["num_records"]).as_py() or 0,
+        "rows": table.num_rows,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    return table, report
+
+def silver_months_since(version, path=SILVER_PATH):
+    """
+    Meses de Silver que pueden haber cambiado desde `version`, según su historial.
+
+    Los MERGE incrementales registran en su metadata los meses que tocaron; OPTIMIZE y
+    VACUUM no cambian los datos. Cualquier otro commit (por ejemplo una reconstrucción
+    completa) puede haber cambiado cualquier mes.
+
+    Retorna:
+    - set o None: Meses como "YYYY-MM-DD HH:MM:SS"; None si hay que recalcular todo.
+    """
+    months = set()
+    for commit in DeltaTable(path).history():
+        if commit["version"] <= version:
+            continue
+        if CHANGED_MONTHS_KEY in commit:
+            months.update(month for month in commit[CHANGED_MONTHS_KEY].split(",") if month)
+        elif commit["operation"] not in DATA_NEUTRAL_OPERATIONS:
+            return None
+    return months
+
+def aggregate_gold(table, dimension):
+    """
+    Cuenta crímenes por mes y por `dimension`.
+
+    Retorna:
+    - pa.Table con columnas crime_month, `dimension` y crimes, ordenada por las dos primeras.
+    """
+    counts = table.group_by(["crime_month", dimension]).aggregate([([], "count_all")])
+    counts = counts.rename_columns({"count_all": "crimes"}).select(["crime_month", dimension, "crimes"])
+    return counts.sort_by([("crime_month", "ascending"), (dimension, "ascending")])
+
+def update_gold(silver_path=SILVER_PATH, gold_path=GOLD_PATH):
+    """
+    Mantiene las tablas agregadas de Gold (`GOLD_DIMENSIONS`) a partir de Silver.
+
+    Cada tabla registra en la metadata de sus commits la versión de Silver que agregó. Si
+    Silver avanzó, solo se recalculan los meses que cambiaron desde esa
+    versión (ver `silver_months_since`), y en la tabla de Gold se reemplazan esos mismos
+    meses. Una tabla que todavía no existe, o que viene de una reconstrucción completa de
+    Silver, se calcula completa.
+
+    Retorna:
+    - dict: Tiempo de pared, pico de memoria y filas escritas por tabla.
+    """
+    with measure() as stats:
+        silver = DeltaTable(silver_path)
+        silver_version = silver.version()
+        dataset = silver.to_pyarrow_dataset()
+        metadata = {SILVER_VERSION_KEY: str(silver_version)}
+        written = {}
+
+        for name, dimension in GOLD_DIMENSIONS.items():
+            path = f"{gold_path}/{name}"
+            consumed = consumed_version(path, SILVER_VERSION_KEY)
+            if consumed == silver_version:
+                continue
+            months = None if consumed is None else silver_months_since(consumed, silver_path)
+
+            if months is None:
+                counts = aggregate_gold(dataset.to_table(columns=["crime_month", dimension]), dimension)
+                with delta_commit("write_gold", path, counts, metadata=metadata, table=name) as commit_options:
+                    write_deltalake(path, counts, mode="overwrite", schema_mode="overwrite",
+                                    **commit_options)
+            elif months:
+                month_values = parse_month(pa.array(sorted(month[:10] for month in months), pa.string()))
+                rows = dataset.to_table(columns=["crime_month", dimension],
+                                        filter=ds.field("crime_month").isin(month_values))
+                counts = aggregate_gold(rows, dimension)
+                months_sql = ", ".join(f"'{month}'" for month in sorted(months))
+                with delta_commit("write_gold", path, counts, metadata=metadata, table=name) as commit_options:
+                    write_deltalake(path, counts, mode="overwrite", predicate=f"crime_month IN ({months_sql})",
+                                    **commit_options)
+            else:
+                continue
+            written[name] = counts.num_rows
+
+    stats.update({"silver_version": silver_version, "rows": written})
+    print(f"Gold: {stats}")
+    return stats
+
+def read_gold(name, months=None, gold_path=GOLD_PATH):
+    """
+    Lee una tabla agregada de Gold para un tablero.
+
+    Parámetros:
+    - name (str): Una de las claves de `GOLD_DIMENSIONS`.
+    - months (list, opcional): Meses "YYYY-MM" a devolver. Por defecto, todos.
+
+    Retorna:
+    - DataFrame con crime_month, la dimensión y la cantidad de crímenes.
+    """
+    dataset = DeltaTable(f"{gold_path}/{name}").to_pyarrow_dataset()
+    month_filter = None
+    if months is not None:
+        month_filter = ds.field("crime_month").isin(parse_month(pa.array(months, pa.string())))
+    return dataset.to_table(filter=month_filter).to_pandas()
+
+def monthly_category_counts(dt):
+    """
+    Tabla dinámica de crímenes por mes (filas) y categoría (columnas) de una tabla Delta de crímenes.
+    """
+    df = dt.to_pandas(columns=["crime_month", "crime_category", "crime_persistent_id"])
+    return pd.pivot_table(df, index="crime_month", columns="crime_category", values="crime_persistent_id",
+                          aggfunc="count", fill_value=0)
 
+# La extracción y las escrituras corren solo al ejecutar el script, no al importarlo
+# (por ejemplo, desde crimes_benchmark.py). Las etapas las corre crimes_stages.py, que saltea
+# las que no cambiaron desde la corrida anterior
+if __name__ == "__main__":
+    from crimes_stages import run_stages
 
+    run_stages()
 
+    # Las consultas repetidas se sirven desde el cache mientras Silver no cambie de versión
+    query_cache = QueryCache(QUERY_CACHE_DIR)
+    print(query_cache.run(SILVER_PATH, monthly_category_counts))
+    print(f"Cache de consultas: {query_cache.stats()}")
 
+    # Lectura con poda: solo los archivos de Silver que pueden tener robos de ese mes, y solo dos columnas
+    burglaries, read_report = read_crimes(columns=["crime_persistent_id", "street_name"], months=[MONTHS[-1]],
+                                          categories=["Burglary"])
+    print(f"Robos en {MONTHS[-1]}: {burglaries.num_rows} ({read_report})")
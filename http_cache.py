@@ -0,0 +1,123 @@
+import json
+import time
+
+import requests
+
+from disk_cache import DiskCache
+
+
+# Directorio por defecto donde se guardan las respuestas cacheadas
+CACHE_DIR = "data/cache/http"
+# Tiempo de vida por defecto de una respuesta (segundos) y tamaño máximo del cache (bytes)
+DEFAULT_TTL = 24 * 60 * 60
+MAX_BYTES = 512 * 1024 * 1024
+
+
+class ResponseCache(DiskCache):
+    """
+    Cache persistente en disco para respuestas HTTP GET.
+
+    Cada respuesta se guarda en un archivo JSON cuyo nombre es el hash de la URL y los
+    parámetros. Una entrada se sirve sin tocar la red mientras no supere su TTL; cuando
+    vence y el servidor había enviado `ETag` o `Last-Modified`, se revalida con una
+    solicitud condicional (un 304 renueva la entrada sin volver a descargarla).
+    Si el cache supera `max_bytes`, se eliminan las entradas usadas hace más tiempo (LRU).
+
+    Parámetros:
+    - cache_dir (str): Carpeta donde se guardan las respuestas.
+    - ttl (float, opcional): Segundos de validez por defecto. None = no vence nunca.
+    - max_bytes (int): Tamaño máximo total de las entradas en disco.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=MAX_BYTES):
+        super().__init__(cache_dir, ".json", max_bytes)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def _path(self, url, params):
+        return self._entry_path(json.dumps([url, sorted((params or {}).items())], default=str))
+
+    def _read(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+
+        self._store(path, write)
+
+    @staticmethod
+    def _response(url, entry):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = entry["body"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json"
+        response.from_cache = True  # Para distinguirla de una respuesta que vino de la red
+        return response
+
+    def get(self, url, params=None, headers=None, session=None, ttl=...):
+        """
+        Realiza un GET a través del cache.
+
+        Parámetros:
+        - url (str): URL completa.
+        - params (dict, opcional): Parámetros de consulta (forman parte de la clave).
+        - headers (dict, opcional): Encabezados HTTP.
+        - session (requests.Session, opcional): Sesión a usar cuando hay que ir a la red.
+        - ttl (float, opcional): Validez de esta entrada en segundos; None = no vence.
+          Si se omite se usa el TTL del cache.
+
+        Retorna:
+        - requests.Response: La respuesta (reconstruida desde disco si fue un acierto).
+        """
+        ttl = self.ttl if ttl is ... else ttl
+        path = self._path(url, params)
+        entry = self._read(path)
+
+        if entry is not None and (ttl is None or time.time() - entry["stored_at"] < ttl):
+            self._count("hits")
+            self._touch(path)
+            return self._response(url, entry)
+
+        # Entrada vencida: se revalida con el servidor si tenemos un validador
+        request_headers = dict(headers or {})
+        if entry is not None and entry.get("etag"):
+            request_headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = (session or requests).get(url, params=params, headers=request_headers)
+
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            entry["stored_at"] = time.time()
+            self._write(path, entry)
+            return self._response(url, entry)
+
+        self._count("misses")
+        if response.status_code == 200:
+            self._write(path, {
+                "url": url,
+                "params": params,
+                "stored_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "body": response.text,
+            })
+        return response
+
+    def stats(self):
+        """
+        Devuelve la cantidad de aciertos, fallos y revalidaciones desde que se creó el cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
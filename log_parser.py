@@ -0,0 +1,210 @@
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from deltalake import write_deltalake
+
+
+# Formato de cada línea de log generada en los scripts de procesamiento:
+# ip - fecha hora - "MÉTODO url" - estado - bytes - "user agent"
+# El regex (RE2) solo valida la línea completa; los campos se separan después con cortes de texto.
+# El user agent es lo que queda hasta la última comilla, así que puede contener " - "
+LOG_PATTERN = (
+    r'^{octet}\.{octet}\.{octet}\.{octet}'
+    r' - \d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d+)?'
+    r' - "[A-Z]+ [^" ]*"'
+    r' - \d{1,3}'
+    r' - \d{1,9}'  # Entra en int32
+    r' - ".*"\s*$'
+).replace("{octet}", r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Esquema de la salida del parser
+LOG_SCHEMA = pa.schema([
+    ("ip_cliente", pa.uint32()),
+    ("fecha_hora", pa.timestamp("s")),
+    ("metodo", pa.dictionary(pa.int8(), pa.string())),
+    ("url", pa.string()),
+    ("codigo_estado", pa.int16()),
+    ("bytes_transmitidos", pa.int32()),
+    ("navegador_cliente", pa.string()),
+])
+# Delta no tiene enteros sin signo: en las tablas Delta la IP se guarda como int64
+DELTA_LOG_SCHEMA = LOG_SCHEMA.set(0, pa.field("ip_cliente", pa.int64()))
+# Tamaño de cada bloque leído del archivo de logs (bytes); el pico de memoria depende de este valor
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def parse_log_lines(lines):
+    """
+    Convierte líneas de log en una tabla con columnas tipadas.
+
+    Cada paso es un kernel de Arrow sobre la columna completa: una validación con
+    `LOG_PATTERN`, un único corte en " - " (a lo sumo 5 cortes, así el user agent queda
+    entero aunque contenga " - ") y las conversiones de tipo.
+
+    Parámetros:
+    - lines (pd.Series, list, pa.Array o pa.ChunkedArray): Líneas de log.
+
+    Retorna:
+    - pa.Table con el esquema `LOG_SCHEMA`, con una fila por línea válida. Las líneas que no
+      respetan el formato o tienen una fecha imposible (como 2024-13-45) se descartan (son
+      `len(lines) - table.num_rows`).
+    """
+    if isinstance(lines, pd.Series):
+        lines = pa.array(lines.astype(str), pa.string())
+    elif not isinstance(lines, (pa.Array, pa.ChunkedArray)):
+        lines = pa.array(lines, pa.string())
+
+    # Las líneas con otro formato se descartan antes de cortar, así las conversiones de números no
+    # pueden fallar; la fecha sí (el regex no valida meses ni días) y se descarta después
+    lines = pc.filter(lines, pc.match_substring_regex(lines, LOG_PATTERN))
+    parts = pc.split_pattern(lines, " - ", max_splits=5)
+    ip, timestamp, request, status, size, user_agent = (pc.list_element(parts, i) for i in range(6))
+
+    octets = pc.split_pattern(ip, ".")
+    ip_number = None
+    for i in range(4):
+        octet = pc.cast(pc.list_element(octets, i), pa.uint32())
+        ip_number = octet if ip_number is None else pc.add(pc.shift_left(ip_number, 8), octet)
+
+    # Petición sin comillas: "MÉTODO url"
+    request = pc.split_pattern(pc.utf8_slice_codeunits(request, 1, -1), " ", max_splits=1)
+    timestamp = pc.replace_substring(pc.utf8_slice_codeunits(timestamp, 0, 19), "T", " ")
+
+    columns = {
+        "ip_cliente": ip_number,
+        "fecha_hora": pc.strptime(timestamp, format=TIMESTAMP_FORMAT, unit="s", error_is_null=True),
+        "metodo": pc.cast(pc.dictionary_encode(pc.list_element(request, 0)), LOG_SCHEMA.field("metodo").type),
+        "url": pc.list_element(request, 1),
+        "codigo_estado": pc.cast(status, pa.int16()),
+        "bytes_transmitidos": pc.cast(size, pa.int32()),
+        "navegador_cliente": pc.utf8_slice_codeunits(pc.utf8_rtrim_whitespace(user_agent), 1, -1),
+    }
+    table = pa.table([columns[name] for name in LOG_SCHEMA.names], schema=LOG_SCHEMA)
+    return table.filter(pc.is_valid(table["fecha_hora"]))
+
+
+def iter_log_lines(path, block_size=BLOCK_SIZE):
+    """
+    Lee un archivo de logs por bloques de a lo sumo `block_size` bytes.
+
+    El lector CSV de Arrow se usa solo para cortar el archivo en líneas (sin delimitador ni
+    comillas), así la lectura no pasa por objetos de Python.
+
+    Retorna:
+    - generator: pa.Array de strings (una línea por elemento) por bloque.
+    """
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(column_names=["line"], block_size=block_size),
+        parse_options=pacsv.ParseOptions(delimiter="\x1f", quote_char=False, escape_char=False,
+                                         ignore_empty_lines=True),
+        convert_options=pacsv.ConvertOptions(column_types={"line": pa.string()}),
+    )
+    for batch in reader:
+        yield batch.column(0)
+
+
+def parse_log_file(path, output, output_format="parquet", block_size=BLOCK_SIZE):
+    """
+    Parsea un archivo de logs por bloques y escribe el resultado en Parquet o en una tabla Delta.
+
+    Cada bloque se escribe apenas se parsea, así que el archivo completo nunca está en memoria.
+
+    Parámetros:
+    - path (str): Archivo de logs (una línea por registro).
+    - output (str): Archivo parquet o ruta de la tabla Delta de salida.
+    - output_format (str): "parquet" o "delta". La tabla Delta se reemplaza en un único commit
+      y guarda la IP como int64 (`DELTA_LOG_SCHEMA`).
+    - block_size (int): Bytes leídos por bloque.
+
+    Retorna:
+    - dict: Líneas leídas, líneas inválidas, segundos y líneas por segundo.
+    """
+    stats = {"lines": 0, "invalid_lines": 0}
+    schema = DELTA_LOG_SCHEMA if output_format == "delta" else LOG_SCHEMA
+
+    def batches():
+        for lines in iter_log_lines(path, block_size):
+            table = parse_log_lines(lines).cast(schema)
+            stats["lines"] += len(lines)
+            stats["invalid_lines"] += len(lines) - table.num_rows
+            yield from table.to_batches()
+
+    start = time.perf_counter()
+    if output_format == "parquet":
+        with pq.ParquetWriter(output, schema) as writer:
+            for batch in batches():
+                writer.write_batch(batch)
+    elif output_format == "delta":
+        write_deltalake(output, pa.RecordBatchReader.from_batches(schema, batches()), mode="overwrite")
+    else:
+        raise ValueError(f"Formato desconocido: {output_format}")
+    elapsed = time.perf_counter() - start
+
+    stats.update({"seconds": round(elapsed, 4), "lines_per_s": round(stats["lines"] / elapsed) if elapsed else None})
+    print(f"Logs ({output_format}): {stats}")
+    return stats
+
+
+def parse_log_lines_split(lines):
+    """
+    Parser anterior de los scripts: `str.split(" - ")` y un segundo split de la petición.
+    Se conserva solo como referencia para `benchmark_log_parser`.
+    """
+    df = pd.Series(lines, name="log").str.split(" - ", expand=True, n=5)
+    df = df.rename(columns={
+        0: "ip_cliente",
+        1: "fecha_hora",
+        2: "peticion",
+        3: "codigo_estado",
+        4: "bytes_transmitidos",
+        5: "navegador_cliente",
+    })
+    df[["metodo", "url"]] = df["peticion"].str.strip('"').str.split(" ", expand=True, n=1)
+    return df
+
+
+def benchmark_log_parser(lines, repeat=3):
+    """
+    Compara el parser vectorizado con el de `str.split` sobre las mismas líneas.
+
+    Parámetros:
+    - lines (pd.Series o list): Líneas de log.
+    - repeat (int): Repeticiones por parser; se informa la más rápida.
+
+    Retorna:
+    - DataFrame con segundos, líneas por segundo y memoria del resultado por parser.
+    """
+    lines = pd.Series(lines, name="log")
+    rows = []
+    for name, parser in [("split", parse_log_lines_split),
+                         ("vectorizado", lambda values: parse_log_lines(values).to_pandas())]:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = parser(lines)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        rows.append({
+            "parser": name,
+            "lines": len(lines),
+            "seconds": round(best, 4),
+            "lines_per_s": round(len(lines) / best) if best else None,
+            "memory_mb": round(result.memory_usage(deep=True).sum() / 2**20, 1),
+        })
+    return pd.DataFrame(rows)
+
+
+def write_log_lines(lines, path):
+    """
+    Escribe líneas de log en un archivo de texto (una por línea), para probar `parse_log_file`.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
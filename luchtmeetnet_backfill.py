@@ -0,0 +1,213 @@
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+from deltalake import write_deltalake
+
+from pipeline_common import commit_value, create_session, delta_commit, iter_pages, rate_limiter
+from profiling import measure
+
+
+BASE_URL = "https://api.luchtmeetnet.nl/open_api"
+# Tabla Delta con las mediciones horarias, particionada por día y estación
+MEASUREMENTS_PATH = "data/bronze/luchtmeetnet/measurements"
+MEASUREMENTS_PARTITION = ["date", "station_number"]
+MEASUREMENTS_SCHEMA = pa.schema([
+    ("station_number", pa.string()),
+    ("formula", pa.string()),
+    ("value", pa.float64()),
+    ("timestamp_measured", pa.timestamp("us", tz="UTC")),
+    ("date", pa.string()),
+])
+# Intervalo máximo (start-end) que se pide en una sola consulta de measurements
+WINDOW = timedelta(days=7)
+# Demora con que luchtmeetnet publica cada hora: por defecto no se piden las horas más recientes
+# que esto, que todavía pueden estar incompletas
+PUBLICATION_LAG = timedelta(hours=2)
+# Concurrencia del backfill: ventanas (estación, intervalo) pedidas a la vez y tope propio de
+# solicitudes por segundo, porque la API no publica un límite
+MAX_WORKERS = 8
+MAX_RPS = 10
+# Clave en la metadata de cada commit con la marca de agua de cada estación: la hora siguiente a
+# la última medición recibida. Se escribe en el mismo commit que los datos, así que nunca se
+# adelanta a lo que quedó guardado
+WATERMARKS_KEY = "station_watermarks"
+API_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def to_hour(value):
+    """
+    Convierte una fecha (str, datetime o Timestamp) a un Timestamp en UTC, truncado a la hora.
+    """
+    timestamp = pd.Timestamp(value)
+    timestamp = timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+    return timestamp.floor("h")
+
+
+def read_watermarks(path=MEASUREMENTS_PATH):
+    """
+    Marcas de agua por estación registradas en el último commit de la tabla.
+
+    Retorna:
+    - dict: Número de estación -> Timestamp de la primera hora sin cargar (vacío si la tabla no existe).
+    """
+    value = commit_value(path, WATERMARKS_KEY)
+    return {station: pd.Timestamp(hour) for station, hour in json.loads(value or "{}").items()}
+
+
+def station_numbers(base_url=BASE_URL, session=None, wait=None):
+    """
+    Números de todas las estaciones de la red.
+    """
+    pages = iter_pages(base_url, "stations", max_workers=1, session=session, wait=wait, required=True)
+    return sorted({station["number"] for page in pages for station in page})
+
+
+def fetch_window(base_url, station, start, end, session=None, wait=None):
+    """
+    Mediciones de una estación en el intervalo [start, end), con todas sus páginas.
+
+    Retorna:
+    - list de registros, o None si la consulta falló.
+    """
+    params = {
+        "station_number": station,
+        "start": start.strftime(API_TIME_FORMAT),
+        # La API incluye el extremo final: se pide hasta el último segundo antes de `end`
+        "end": (end - pd.Timedelta(seconds=1)).strftime(API_TIME_FORMAT),
+    }
+    # Las páginas de una ventana se piden de a una: el paralelismo está en las estaciones
+    pages = iter_pages(base_url, "measurements", params=params, max_workers=1, session=session, wait=wait,
+                       required=True)
+    try:
+        records = [record for page in pages for record in page]
+    except RuntimeError:
+        return None
+    for record in records:
+        record.setdefault("station_number", station)
+    return records
+
+
+def measurements_table(records):
+    """
+    Convierte registros de measurements en una tabla con el esquema `MEASUREMENTS_SCHEMA`.
+    """
+    df = pd.DataFrame(records, columns=["station_number", "formula", "value", "timestamp_measured"])
+    timestamps = pd.to_datetime(df["timestamp_measured"], utc=True)
+    df = df.assign(
+        value=pd.to_numeric(df["value"], errors="coerce"),
+        timestamp_measured=timestamps,
+        date=timestamps.dt.strftime("%Y-%m-%d"),
+    )
+    return pa.Table.from_pandas(df, preserve_index=False).cast(MEASUREMENTS_SCHEMA)
+
+
+def backfill_measurements(start, end=None, stations=None, base_url=BASE_URL, path=MEASUREMENTS_PATH,
+                          max_workers=MAX_WORKERS, max_rps=MAX_RPS, window=WINDOW):
+    """
+    Carga el histórico de mediciones de [start, end) en la tabla Delta `path`, por ventanas.
+
+    El rango se divide en tramos de `window` (lo que acepta la API por consulta). En cada tramo
+    se piden en paralelo las ventanas de todas las estaciones, con a lo sumo `max_workers`
+    consultas en vuelo y `max_rps` solicitudes por segundo, y el resultado se agrega a la tabla
+    en un commit que también guarda la marca de agua de cada estación.
+
+    Cada estación empieza desde su marca de agua: volver a correr el mismo rango solo pide las
+    horas nuevas, y un job interrumpido sigue desde el último tramo guardado. La marca de agua
+    avanza solo hasta la última medición recibida, así que las horas que la API todavía no
+    publicó se vuelven a pedir en la próxima corrida. Si una ventana falla, esa estación no
+    avanza más en esta corrida (para no dejar un hueco detrás de su marca de agua) y se
+    reintenta en la próxima.
+
+    Parámetros:
+    - start: Primera hora a cargar (str, datetime o Timestamp; sin zona se toma como UTC).
+    - end (opcional): Hora final, excluida. Por defecto, la hora en curso menos `PUBLICATION_LAG`.
+    - stations (list, opcional): Números de estación. Por defecto, todas las de la red.
+    - window (timedelta): Largo de cada consulta.
+
+    Retorna:
+    - dict: Tramos, commits, solicitudes de ventanas, filas, estaciones con fallas, tiempo y memoria.
+    """
+    start = to_hour(start)
+    end = to_hour(end if end is not None else datetime.now(timezone.utc) - PUBLICATION_LAG)
+    wait = rate_limiter(max_rps)
+    result = {"windows": 0, "commits": 0, "requests": 0, "rows": 0, "failed_stations": []}
+
+    with measure() as stats, create_session(max_workers) as session:
+        stations = list(stations) if stations is not None else station_numbers(base_url, session, wait)
+        watermarks = read_watermarks(path)
+        failed = set()
+
+        def fetch(task):
+            station, window_start, window_end = task
+            return fetch_window(base_url, station, window_start, window_end, session, wait)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window_start = start
+            while window_start < end:
+                window_end = min(window_start + window, end)
+                result["windows"] += 1
+                tasks = []
+                for station in stations:
+                    first_hour = max(window_start, watermarks.get(station, start))
+                    if station not in failed and first_hour < window_end:
+                        tasks.append((station, first_hour, window_end))
+
+                if tasks:
+                    records = []
+                    for (station, _, _), station_records in zip(tasks, executor.map(fetch, tasks)):
+                        if station_records is None:
+                            failed.add(station)
+                            continue
+                        records.extend(station_records)
+                    result["requests"] += len(tasks)
+
+                    table = measurements_table(records)
+                    # Sin mediciones (por ejemplo, horas que todavía no se publicaron) no hay nada que guardar
+                    if table.num_rows:
+                        # Cada estación avanza hasta la hora siguiente a su última medición recibida
+                        last = table.group_by("station_number").aggregate([("timestamp_measured", "max")])
+                        for station, hour in zip(last["station_number"].to_pylist(),
+                                                 last["timestamp_measured_max"].to_pylist()):
+                            watermark = to_hour(hour) + pd.Timedelta(hours=1)
+                            watermarks[station] = max(watermarks.get(station, watermark), watermark)
+                        metadata = {WATERMARKS_KEY: json.dumps({
+                            station: hour.strftime(API_TIME_FORMAT) for station, hour in sorted(watermarks.items())
+                        })}
+                        with delta_commit("backfill_measurements", path, table, metadata=metadata,
+                                          window_start=str(window_start)) as commit_options:
+                            write_deltalake(path, table, mode="append", partition_by=MEASUREMENTS_PARTITION,
+                                            **commit_options)
+                        result["commits"] += 1
+                        result["rows"] += table.num_rows
+                window_start = window_end
+
+        result["failed_stations"] = sorted(failed)
+
+    result.update(stats)
+    print(f"Backfill luchtmeetnet: {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Carga el histórico de mediciones de luchtmeetnet en una tabla Delta, por ventanas y en paralelo."
+    )
+    parser.add_argument("start", help="Primera hora a cargar (por ejemplo 2024-01-01), en UTC.")
+    parser.add_argument("--end", default=None,
+                        help="Hora final, excluida. Por defecto, la hora en curso menos la demora de publicación.")
+    parser.add_argument("--stations", nargs="*", default=None, help="Números de estación. Por defecto, todas.")
+    parser.add_argument("--path", default=MEASUREMENTS_PATH, help="Tabla Delta de destino.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Consultas en paralelo.")
+    parser.add_argument("--max-rps", type=float, default=MAX_RPS, help="Solicitudes por segundo como máximo.")
+    parser.add_argument("--window-days", type=float, default=WINDOW.days, help="Días por consulta.")
+    args = parser.parse_args()
+    backfill_measurements(args.start, args.end, args.stations, path=args.path, max_workers=args.workers,
+                          max_rps=args.max_rps, window=timedelta(days=args.window_days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+import requests
+from deltalake import CommitProperties, DeltaTable, PostCommitHookProperties
+
+from delta_snapshot import CHECKPOINT_INTERVAL, checkpoint_if_due
+from profiling import data_bytes, metrics
+
+
+# Conexiones keep-alive por defecto de una sesión HTTP (solicitudes simultáneas)
+MAX_WORKERS = 4
+# Filas por row group de los archivos de Bronze. La lectura por lotes de parquet carga un row
+# group entero, así que este valor acota la memoria de recorrer Bronze (modo "streaming")
+BRONZE_ROW_GROUP_SIZE = 100_000
+
+
+# 🔹 HTTP
+
+def get_data(base_url, endpoint, params=None, headers=None, session=None, raise_status=(),
+             cache=None, ttl=..., data_field=None):
+    """
+    Realiza una solicitud GET a una API para obtener datos en formato JSON.
+
+    Si se pasa `data_field`, devuelve solo esa clave del JSON (o el JSON completo si no la tiene).
+    Si se pasa `session`, se reutiliza su conexión keep-alive en lugar de abrir una nueva.
+    Los códigos HTTP incluidos en `raise_status` se propagan como `HTTPError` en lugar de
+    imprimirse, para que quien llama pueda reaccionar (por ejemplo, dividir el polígono).
+    Si se pasa `cache` (un `ResponseCache`), la respuesta se busca primero en disco;
+    `ttl` permite fijar la validez de esta entrada en particular.
+
+    La latencia, el estado y el tamaño de cada respuesta se registran en el histograma del
+    endpoint (`metrics`).
+    """
+    start = time.perf_counter()
+    try:
+        url = f"{base_url}/{endpoint}"
+        try:
+            if cache is not None:
+                response = cache.get(url, params=params, headers=headers, session=session, ttl=ttl)
+            else:
+                response = (session or requests).get(url, params=params, headers=headers)
+        except requests.exceptions.RequestException:
+            metrics.observe_http(endpoint, time.perf_counter() - start)
+            raise
+        metrics.observe_http(endpoint, time.perf_counter() - start, response.status_code, len(response.content),
+                             cached=getattr(response, "from_cache", False))
+        if response.status_code in raise_status:
+            raise requests.exceptions.HTTPError(response=response)
+        response.raise_for_status()
+        data = response.json()
+        return data.get(data_field, data) if data_field and isinstance(data, dict) else data
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code in raise_status:
+            raise
+        print(f"Error en la solicitud: {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"Error en la solicitud: {e}")
+        return None
+    except ValueError:
+        print("Error al procesar la respuesta JSON")
+        return None
+
+
+def iter_pages(base_url, endpoint, data_field="data", params=None, headers=None, max_workers=8, session=None,
+               cache=None, wait=None, required=False):
+    """
+    Recorre todas las páginas de un endpoint paginado y devuelve los datos página por página.
+
+    La primera página indica en `pagination.last_page` cuántas páginas hay; el resto se
+    piden en paralelo, con a lo sumo `max_workers` páginas en vuelo a la vez, y se
+    entregan en orden. Así nunca se guarda la respuesta completa en memoria.
+
+    Parámetros:
+    - base_url (str): URL base de la API.
+    - endpoint (str): Endpoint específico dentro de la API.
+    - data_field (str): Clave del JSON que contiene los datos de cada página.
+    - params (dict, opcional): Parámetros de consulta (se les agrega `page`).
+    - headers (dict, opcional): Encabezados HTTP.
+    - max_workers (int): Cantidad máxima de páginas pedidas en paralelo.
+    - session (requests.Session, opcional): Sesión keep-alive a reutilizar.
+    - cache (ResponseCache, opcional): Cache en disco para las páginas.
+    - wait (callable, opcional): Se llama antes de cada solicitud (por ejemplo, un `rate_limiter`).
+    - required (bool): Si una página que no se pudo obtener lanza `RuntimeError` en lugar de
+      saltearse (para quien no puede aceptar resultados incompletos).
+
+    Retorna:
+    - generator: Lista de registros de cada página.
+    """
+    params = dict(params or {})
+
+    def fetch_page(page):
+        if wait:
+            wait()
+        page_data = get_data(base_url, endpoint, params={**params, "page": page}, headers=headers, session=session,
+                             cache=cache)
+        if not isinstance(page_data, dict):
+            if required:
+                raise RuntimeError(f"No se pudo obtener la página {page} de {endpoint}")
+            return {}
+        return page_data
+
+    first = fetch_page(1)
+    if first.get(data_field):
+        yield first[data_field]
+
+    last_page = (first.get("pagination") or {}).get("last_page") or 1
+    pages = iter(range(2, last_page + 1))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Se piden las páginas por tandas para que la memoria no crezca con el total
+        while batch := list(islice(pages, max_workers)):
+            for page_data in executor.map(fetch_page, batch):
+                if page_data.get(data_field):
+                    yield page_data[data_field]
+
+
+def create_session(max_workers=MAX_WORKERS):
+    """
+    Crea una sesión HTTP con un pool de conexiones keep-alive del tamaño de los workers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def rate_limiter(max_rps):
+    """
+    Devuelve una función que bloquea lo necesario para no superar `max_rps` solicitudes por segundo.
+    Es segura para usar desde varios hilos. Con `max_rps=None` no limita.
+    """
+    lock = threading.Lock()
+    interval = 1.0 / max_rps if max_rps else 0.0
+    next_slot = [time.monotonic()]
+
+    def wait():
+        if not interval:
+            return
+        with lock:
+            now = time.monotonic()
+            slot = max(next_slot[0], now)
+            next_slot[0] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    return wait
+
+
+# 🔹 Delta
+
+def commit_size(path, version):
+    """
+    Filas y bytes de los archivos que agregó una versión de una tabla Delta local, según su log.
+    """
+    rows = size = 0
+    with open(os.path.join(path, "_delta_log", f"{version:020d}.json")) as f:
+        for line in f:
+            add = json.loads(line).get("add")
+            if add:
+                size += add["size"]
+                rows += json.loads(add.get("stats") or "{}").get("numRecords", 0)
+    return {"rows": rows, "bytes": size}
+
+
+@contextmanager
+def delta_commit(name, path, data=None, metadata=None, **fields):
+    """
+    Mide una escritura en Delta como un paso de `metrics`.
+
+    Entrega las opciones de la escritura (`commit_properties` y `post_commithook_properties`,
+    que aceptan `write_deltalake`, `merge` y las transacciones de Delta): en la metadata del
+    commit van `metadata` y las métricas de los pasos que produjeron los datos (ver
+    `Metrics.commit_metadata`). Al terminar registra la versión escrita, las filas y bytes de los
+    archivos agregados y las métricas de la operación que informa Delta.
+
+    Los checkpoints los escribe solo este paso, cuando pasaron `CHECKPOINT_INTERVAL` commits desde
+    el anterior: el hook de delta-rs, que los escribe cada 100 commits, queda desactivado.
+
+    Uso:
+        with delta_commit("write_bronze", path, df) as commit_options:
+            write_deltalake(path, df, **commit_options)
+    """
+    if data is not None:
+        fields.update({"rows_in": len(data), "bytes_in": data_bytes(data)})
+    with metrics.step(name, path=path, **fields) as record:
+        yield {
+            "commit_properties": CommitProperties(custom_metadata=metrics.commit_metadata(path, metadata)),
+            "post_commithook_properties": PostCommitHookProperties(create_checkpoint=False),
+        }
+        entry = DeltaTable(path).history(1)[0]
+        written = commit_size(path, entry["version"])
+        record.update({
+            "version": entry["version"],
+            "operation": entry["operation"],
+            "rows_out": written["rows"],
+            "bytes_out": written["bytes"],
+            "operation_metrics": entry.get("operationMetrics", {}),
+            "checkpoint": checkpoint_if_due(path, CHECKPOINT_INTERVAL, entry["version"]),
+        })
+
+
+def commit_value(path, key):
+    """
+    Devuelve el último valor registrado con `key` en la metadata de los commits de una tabla,
+    o None si la tabla no existe o ningún commit lo registró.
+    """
+    if not DeltaTable.is_deltatable(path):
+        return None
+    for commit in DeltaTable(path).history():
+        if key in commit:
+            return commit[key]
+    return None
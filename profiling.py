@@ -0,0 +1,232 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows no tiene el módulo resource
+    resource = None
+
+
+# Cada cuántos segundos se mide la memoria residente mientras corre el bloque medido
+SAMPLE_INTERVAL = 0.01
+# Archivo JSON-lines al que se agrega un registro por cada paso medido con `Metrics.step`
+METRICS_PATH = "data/metrics/pipeline.jsonl"
+# Clave de la metadata de commit de Delta con las métricas de los pasos que produjeron esa versión
+METRICS_KEY = "pipeline_metrics"
+# Límites superiores (ms) de los intervalos del histograma de latencia HTTP; el último no tiene límite
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000]
+
+
+def current_rss():
+    """
+    Devuelve la memoria residente (RSS) actual del proceso en bytes.
+
+    En Linux se lee de /proc/self/statm; en otros sistemas se usa el máximo
+    histórico que informa `resource`, que es lo más cercano disponible (en macOS
+    viene en bytes y en el resto en KB). Sin `resource` (Windows) devuelve 0.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@contextmanager
+def measure():
+    """
+    Mide el tiempo y el pico de memoria residente de un bloque de código.
+
+    Un hilo muestrea la RSS cada `SAMPLE_INTERVAL` segundos. Al salir del bloque,
+    el diccionario devuelto contiene:
+    - seconds: tiempo de pared.
+    - peak_rss_mb: pico de RSS del proceso durante el bloque.
+    - peak_rss_delta_mb: pico de RSS por encima de la RSS al entrar al bloque.
+
+    Uso:
+        with measure() as stats:
+            ...
+        print(stats["seconds"], stats["peak_rss_mb"])
+    """
+    stats = {}
+    start_rss = current_rss()
+    peak = [start_rss]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(SAMPLE_INTERVAL):
+            peak[0] = max(peak[0], current_rss())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        elapsed = time.perf_counter() - start
+        done.set()
+        sampler.join()
+        peak[0] = max(peak[0], current_rss())
+        stats["seconds"] = round(elapsed, 4)
+        stats["peak_rss_mb"] = round(peak[0] / 2**20, 1)
+        stats["peak_rss_delta_mb"] = round((peak[0] - start_rss) / 2**20, 1)
+
+
+def data_bytes(data):
+    """
+    Tamaño en memoria (bytes) de un DataFrame o de una tabla / record batch de Arrow.
+    """
+    if data is None:
+        return 0
+    if hasattr(data, "memory_usage"):
+        return int(data.memory_usage(deep=True, index=False).sum())
+    return data.nbytes
+
+
+def empty_histogram():
+    """
+    Histograma de latencia vacío para un endpoint.
+    """
+    return {
+        "requests": 0,
+        "errors": 0,
+        "cached": 0,
+        "bytes": 0,
+        "seconds": 0.0,
+        "buckets": {f"le_{bound}ms": 0 for bound in LATENCY_BUCKETS_MS} | {"inf": 0},
+    }
+
+
+def histogram_diff(after, before):
+    """
+    Solicitudes registradas entre dos fotos de los histogramas (`after` - `before`), por endpoint.
+    """
+    diff = {}
+    for endpoint, current in after.items():
+        previous = before.get(endpoint, empty_histogram())
+        delta = {key: current[key] - previous[key] for key in ("requests", "errors", "cached", "bytes")}
+        if not delta["requests"]:
+            continue
+        delta["seconds"] = round(current["seconds"] - previous["seconds"], 4)
+        delta["buckets"] = {
+            bucket: count - previous["buckets"][bucket] for bucket, count in current["buckets"].items()
+        }
+        diff[endpoint] = delta
+    return diff
+
+
+class Metrics:
+    """
+    Instrumentación del pipeline: pasos medidos y latencia HTTP por endpoint.
+
+    Cada paso (`step`) registra tiempo de pared, pico de RSS, las filas y bytes que el código
+    informe (rows_in, rows_out, bytes_in, bytes_out) y las solicitudes HTTP hechas durante el
+    paso, y se agrega como una línea a `path`. Un paso que produce datos para una tabla Delta
+    (`target`) queda pendiente hasta el siguiente commit de esa tabla: `commit_metadata` los
+    agrega a la metadata del commit, así cada versión de una tabla guarda lo que costó producirla.
+    Los pendientes se guardan por tabla, así un commit no se lleva los pasos de otra etapa que
+    corre al mismo tiempo.
+
+    Parámetros:
+    - path (str): Archivo JSON-lines de salida.
+
+    Uso:
+        with metrics.step("process_crime_data", target=SILVER_PATH, rows_in=n) as record:
+            ...
+            record["rows_out"] = len(df)
+    """
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._http = {}
+        self._pending = {}
+
+    def observe_http(self, endpoint, seconds, status=None, size=0, cached=False):
+        """
+        Registra una solicitud HTTP. Las respuestas servidas desde el cache se cuentan aparte
+        y no entran en el histograma de latencia.
+        """
+        with self._lock:
+            histogram = self._http.setdefault(endpoint, empty_histogram())
+            histogram["requests"] += 1
+            histogram["bytes"] += size
+            if status is None or status >= 400:
+                histogram["errors"] += 1
+            if cached:
+                histogram["cached"] += 1
+                return
+            histogram["seconds"] += seconds
+            bucket = next((f"le_{bound}ms" for bound in LATENCY_BUCKETS_MS if seconds * 1000 <= bound), "inf")
+            histogram["buckets"][bucket] += 1
+
+    def http_histograms(self):
+        """
+        Foto de los histogramas de latencia HTTP acumulados por endpoint.
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._http))
+
+    @contextmanager
+    def step(self, name, target=None, **fields):
+        """
+        Mide un paso del pipeline y lo agrega al archivo de métricas al terminar.
+
+        Si se pasa `endpoint`, el registro solo incluye las solicitudes a ese endpoint (otras
+        etapas pueden estar haciendo solicitudes al mismo tiempo en otros hilos).
+
+        Parámetros:
+        - target (str, opcional): Tabla Delta a cuyo próximo commit va el paso. Sin `target` el
+          paso solo va al archivo (por ejemplo las escrituras, cuyo commit ya se hizo cuando terminan).
+
+        Retorna (en el `with`):
+        - dict: El registro del paso, para completar filas y bytes.
+        """
+        record = {"run_id": self.run_id, "step": name, **fields}
+        http_before = self.http_histograms()
+        with measure() as stats:
+            yield record
+        record.update(stats)
+        http = histogram_diff(self.http_histograms(), http_before)
+        if "endpoint" in fields:
+            http = {endpoint: value for endpoint, value in http.items() if endpoint == fields["endpoint"]}
+        if http:
+            record["http"] = http
+        record["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+        with self._lock:
+            if target is not None:
+                self._pending.setdefault(os.path.abspath(target), []).append(record)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def commit_metadata(self, target, metadata=None, **current):
+        """
+        Metadata para un commit de la tabla Delta `target`: `metadata` más las métricas de los
+        pasos de esa tabla terminados desde su commit anterior (y, si se pasan, los datos del paso
+        en curso).
+
+        Retorna:
+        - dict: Para `CommitProperties(custom_metadata=...)`.
+        """
+        with self._lock:
+            steps = self._pending.pop(os.path.abspath(target), [])
+        if current:
+            steps = steps + [current]
+        value = json.dumps({"run_id": self.run_id, "steps": steps}, default=str)
+        return {**(metadata or {}), METRICS_KEY: value}
+
+
+# Instrumentación compartida por todo el pipeline
+metrics = Metrics()
@@ -0,0 +1,128 @@
+import inspect
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from deltalake import DeltaTable
+
+from disk_cache import DiskCache
+
+
+# Directorio por defecto donde se guardan los resultados cacheados
+CACHE_DIR = "data/cache/queries"
+# Tamaño máximo del cache (bytes)
+MAX_BYTES = 1024 * 1024 * 1024
+# Clave de la metadata del parquet que indica si el resultado era un DataFrame o una tabla Arrow
+RESULT_TYPE_KEY = b"query_cache.result_type"
+# Nombre de columna con el que se guarda una Series sin nombre
+UNNAMED_SERIES = "__series__"
+
+
+def query_definition(query):
+    """
+    Texto que identifica a una función de consulta: su nombre y su código fuente.
+
+    Si se edita la función cambia la clave, así que nunca se sirve un resultado calculado
+    con una versión anterior de la consulta. Si no hay código fuente disponible (por
+    ejemplo, en una consola interactiva) se usa el bytecode.
+    """
+    try:
+        source = inspect.getsource(query)
+    except (OSError, TypeError):
+        code = query.__code__
+        source = code.co_code.hex() + repr(code.co_consts)
+    return f"{query.__module__}.{query.__qualname__}\n{source}"
+
+
+class QueryCache(DiskCache):
+    """
+    Cache persistente de resultados de consultas sobre tablas Delta.
+
+    La clave combina la definición de la consulta (función y argumentos) con la ruta y la
+    versión de la tabla que leyó, así que cuando `DeltaTable.version()` avanza la consulta
+    se recalcula sola. Los resultados se guardan en parquet (DataFrame con su índice o tabla
+    Arrow) y, si el cache supera `max_bytes`, se eliminan los usados hace más tiempo (LRU).
+
+    Parámetros:
+    - cache_dir (str): Carpeta donde se guardan los resultados.
+    - max_bytes (int): Tamaño máximo total de los resultados en disco.
+
+    Uso:
+        cache = QueryCache()
+        df = cache.run("data/silver/crimes", crimes_per_month, "Burglary")
+        # crimes_per_month(dt, "Burglary") recibe la DeltaTable en la versión que se cacheó
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        super().__init__(cache_dir, ".parquet", max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, table_path, version, query, args, kwargs):
+        return self._entry_path(json.dumps(
+            [os.path.abspath(table_path), version, query_definition(query), args, sorted(kwargs.items())],
+            default=repr,
+        ))
+
+    @staticmethod
+    def _read(path):
+        try:
+            table = pq.read_table(path)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        result_type = (table.schema.metadata or {}).get(RESULT_TYPE_KEY)
+        if result_type == b"arrow":
+            return table.replace_schema_metadata(None)
+        if result_type == b"series":
+            series = table.to_pandas().iloc[:, 0]
+            return series.rename(None) if series.name == UNNAMED_SERIES else series
+        return table.to_pandas()
+
+    def _write(self, path, result):
+        if isinstance(result, pd.DataFrame):
+            table = pa.Table.from_pandas(result)
+            result_type = b"pandas"
+        elif isinstance(result, pd.Series):
+            table = pa.Table.from_pandas(result.to_frame(UNNAMED_SERIES if result.name is None else result.name))
+            result_type = b"series"
+        else:
+            table = result
+            result_type = b"arrow"
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), RESULT_TYPE_KEY: result_type})
+        self._store(path, lambda tmp_path: pq.write_table(table, tmp_path))
+
+    def run(self, table_path, query, *args, **kwargs):
+        """
+        Ejecuta `query(dt, *args, **kwargs)` a través del cache.
+
+        Parámetros:
+        - table_path (str): Ruta de la tabla Delta que lee la consulta.
+        - query (callable): Función que recibe la DeltaTable y devuelve un DataFrame, una
+          Series o una pa.Table. Sus argumentos deben poder representarse como texto.
+
+        Retorna:
+        - El resultado de la consulta, del mismo tipo que devolvió `query`.
+        """
+        # La tabla se abre una sola vez: la versión de la clave es la misma que lee la consulta
+        dt = DeltaTable(table_path)
+        path = self._path(table_path, dt.version(), query, args, kwargs)
+
+        result = self._read(path) if os.path.exists(path) else None
+        if result is not None:
+            self._count("hits")
+            self._touch(path)
+            return result
+
+        self._count("misses")
+        result = query(dt, *args, **kwargs)
+        self._write(path, result)
+        return result
+
+    def stats(self):
+        """
+        Devuelve la cantidad de aciertos y fallos desde que se creó el cache.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,247 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from deltalake import WriterProperties, write_deltalake
+
+from pipeline_common import BRONZE_ROW_GROUP_SIZE
+
+
+# Semilla por defecto: con la misma semilla y el mismo tamaño de lote los datos son idénticos
+SEED = 42
+# Filas generadas por lote al escribir a disco; el pico de memoria depende de este valor
+CHUNK_SIZE = 1_000_000
+
+# 🔹 Logs de servidor (mismo formato que generate_fake_logs de los scripts de procesamiento)
+LOG_YEAR = 2024
+HTTP_METHODS = ["GET", "POST", "PUT", "DELETE"]
+DOMAINS = ["example", "shop", "news", "blog", "media", "portal", "store", "forum", "wiki", "mail"]
+URL_PATHS = ["", "index.html", "home", "login", "search", "category/tags", "app/main", "posts/list", "about", "api/v1/items"]
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Opera/9.80 (Windows NT 6.1; U; es-ES) Presto/2.9.181 Version/12.00",
+    "curl/8.4.0",
+    "python-requests/2.31.0",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Monitor - uptime check/1.0",  # Contiene " - ", como algunos agentes reales
+]
+
+# 🔹 Crímenes con la forma de las respuestas de crimes-street de police.uk (esquema de Bronze)
+CRIME_MONTHS = ["2024-01", "2024-02", "2024-03"]
+# Recuadro de AREA_POLY en ezequiel_nunzio_TP1.py: (lat_min, lng_min, lat_max, lng_max)
+CRIME_BBOX = (52.130, 0.238, 52.794, 0.543)
+CRIME_CATEGORIES = [
+    "anti-social-behaviour", "bicycle-theft", "burglary", "criminal-damage-arson", "drugs",
+    "other-theft", "possession-of-weapons", "public-order", "robbery", "shoplifting",
+    "theft-from-the-person", "vehicle-crime", "violent-crime", "other-crime",
+]
+OUTCOME_CATEGORIES = [
+    "Investigation complete; no suspect identified", "Unable to prosecute suspect",
+    "Under investigation", "Local resolution", "Offender given a caution", "Awaiting court outcome",
+]
+LOCATION_TYPES = ["Force", "BTP"]
+STREET_NAMES = ["High Street", "Station Road", "Church Lane", "Mill Road", "Park Avenue", "Kennedy Road",
+                "Mandrake Drive", "Victoria Street", "London Road", "Queen's Road"]
+STREETS = 2_000
+BRONZE_SCHEMA = pa.schema([
+    ("category", pa.string()),
+    ("location_type", pa.string()),
+    ("location", pa.struct([
+        ("latitude", pa.string()),
+        ("longitude", pa.string()),
+        ("street", pa.struct([("id", pa.int64()), ("name", pa.string())])),
+    ])),
+    ("context", pa.string()),
+    ("outcome_status", pa.struct([("category", pa.string()), ("date", pa.string())])),
+    ("persistent_id", pa.string()),
+    ("id", pa.int64()),
+    ("location_subtype", pa.string()),
+    ("month", pa.string()),
+])
+
+# Tabla para pasar bytes a hexadecimal de forma vectorizada
+HEX_TABLE = np.array([f"{i:02x}".encode() for i in range(256)], dtype="S2")
+
+
+def chunk_rng(seed, chunk):
+    """
+    Generador aleatorio del lote `chunk`: cada lote tiene su propia secuencia derivada de la
+    semilla, así se puede generar cualquier lote sin generar los anteriores.
+    """
+    return np.random.default_rng([seed, chunk])
+
+
+def choice(rng, values, n):
+    """
+    Elige `n` valores de `values` al azar y los devuelve como array de strings de Arrow.
+    """
+    return pa.array(values, pa.string()).take(pa.array(rng.integers(0, len(values), n)))
+
+
+def to_string(values):
+    """
+    Convierte un array numérico de NumPy en un array de strings de Arrow.
+    """
+    return pc.cast(pa.array(values), pa.string())
+
+
+def fake_log_lines(n, seed=SEED, chunk=0):
+    """
+    Genera `n` líneas de log de servidor, columna por columna.
+
+    Retorna:
+    - pa.Array de strings con el formato:
+      ip - fecha hora - "MÉTODO url" - estado - bytes - "user agent"
+    """
+    rng = chunk_rng(seed, chunk)
+    octets = [to_string(rng.integers(1 if i == 0 else 0, 256, n)) for i in range(4)]
+    ip = pc.binary_join_element_wise(*octets, ".")
+
+    start = pd.Timestamp(f"{LOG_YEAR}-01-01").value // 10**9
+    end = pd.Timestamp(f"{LOG_YEAR + 1}-01-01").value // 10**9
+    seconds = pa.array(rng.integers(start, end, n), pa.int64()).cast(pa.timestamp("s"))
+    timestamp = pc.strftime(seconds, format="%Y-%m-%d %H:%M:%S")
+
+    url = pc.binary_join_element_wise(
+        "https://www.", choice(rng, DOMAINS, n), ".com/", choice(rng, URL_PATHS, n), ""
+    )
+    return pc.binary_join_element_wise(
+        ip, " - ", timestamp, ' - "', choice(rng, HTTP_METHODS, n), " ", url, '" - ',
+        to_string(rng.integers(100, 600, n)), " - ", to_string(rng.integers(100, 10_001, n)),
+        ' - "', choice(rng, USER_AGENTS, n), '"', "",
+    )
+
+
+def generate_fake_logs(n, seed=SEED):
+    """
+    Reemplazo vectorizado de `generate_fake_logs` de los scripts: mismo formato y misma
+    salida (un DataFrame con la columna 'log'), sin un bucle de Python por fila.
+    """
+    lines = [fake_log_lines(min(CHUNK_SIZE, n - start), seed, chunk)
+             for chunk, start in enumerate(range(0, n, CHUNK_SIZE))]
+    return pd.DataFrame({"log": pa.chunked_array(lines, pa.string()).to_pandas()})
+
+
+def hex_ids(rng, n, length=64):
+    """
+    Genera `n` identificadores hexadecimales de `length` caracteres (como los persistent_id).
+    """
+    raw = rng.integers(0, 256, (n, length // 2), dtype=np.uint8)
+    # El array se arma directo desde sus buffers (todos los ids miden `length` bytes): el que
+    # devuelve pa.array sobre bytes de largo fijo de NumPy hace fallar al escritor de Delta
+    data = np.ascontiguousarray(HEX_TABLE[raw]).view(np.uint8)
+    offsets = np.arange(0, (n + 1) * length, length, dtype=np.int32)
+    return pa.StringArray.from_buffers(n, pa.py_buffer(offsets), pa.py_buffer(data))
+
+
+def fake_crimes(n, seed=SEED, chunk=0, months=CRIME_MONTHS, first_id=0):
+    """
+    Genera `n` crímenes con la forma de las respuestas de crimes-street de police.uk.
+
+    Como en la API real, anti-social behaviour no trae `persistent_id` ni `outcome_status`.
+
+    Retorna:
+    - pa.Table con el esquema `BRONZE_SCHEMA`.
+    """
+    rng = chunk_rng(seed, chunk)
+    lat_min, lng_min, lat_max, lng_max = CRIME_BBOX
+    category = choice(rng, CRIME_CATEGORIES, n)
+    anti_social = pc.equal(category, "anti-social-behaviour")
+
+    street_id = rng.integers(0, STREETS, n)
+    street_name = pc.binary_join_element_wise(
+        "On or near ", pa.array(STREET_NAMES, pa.string()).take(pa.array(street_id % len(STREET_NAMES))), ""
+    )
+    location = pa.StructArray.from_arrays([
+        to_string(rng.uniform(lat_min, lat_max, n).round(6)),
+        to_string(rng.uniform(lng_min, lng_max, n).round(6)),
+        pa.StructArray.from_arrays([pa.array(street_id + 1_000_000), street_name], names=["id", "name"]),
+    ], fields=list(BRONZE_SCHEMA.field("location").type))
+
+    month = choice(rng, months, n)
+    has_outcome = pc.and_(pc.invert(anti_social), pa.array(rng.random(n) < 0.9))
+    outcome_status = pa.StructArray.from_arrays(
+        [choice(rng, OUTCOME_CATEGORIES, n), choice(rng, months, n)],
+        fields=list(BRONZE_SCHEMA.field("outcome_status").type),
+        mask=pc.invert(has_outcome),
+    )
+    empty = pa.array([""] * n, pa.string())
+    columns = {
+        "category": category,
+        "location_type": choice(rng, LOCATION_TYPES, n),
+        "location": location,
+        "context": empty,
+        "outcome_status": outcome_status,
+        "persistent_id": pc.if_else(anti_social, "", hex_ids(rng, n)),
+        "id": pa.array(np.arange(first_id, first_id + n, dtype=np.int64)),
+        "location_subtype": empty,
+        "month": month,
+    }
+    return pa.table([columns[name] for name in BRONZE_SCHEMA.names], schema=BRONZE_SCHEMA)
+
+
+def iter_chunks(make_chunk, n, chunk_size=CHUNK_SIZE, seed=SEED):
+    """
+    Genera `n` filas en lotes de a lo sumo `chunk_size` con `make_chunk(filas, semilla, lote, primera_fila)`.
+    """
+    for chunk, start in enumerate(range(0, n, chunk_size)):
+        yield make_chunk(min(chunk_size, n - start), seed, chunk, start)
+
+
+def write_chunks(batches, schema, path, output_format="parquet", partition_by=None, row_group_size=None):
+    """
+    Escribe lotes en un archivo parquet, un archivo de texto (una línea por fila) o una tabla
+    Delta (un único commit), sin juntarlos en memoria. `row_group_size` acota las filas por
+    row group en parquet y Delta (por defecto, el de cada escritor).
+    """
+    if output_format == "parquet":
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in batches:
+                writer.write_table(batch, row_group_size=row_group_size)
+    elif output_format == "text":
+        with open(path, "wb") as f:
+            for batch in batches:
+                # Cada línea termina en "\n" y se escribe el buffer de datos del array tal cual
+                lines = pc.binary_join_element_wise(batch.column(0).combine_chunks(), "", "\n")
+                offsets = np.frombuffer(lines.buffers()[1], np.int32, len(lines) + 1, lines.offset * 4)
+                f.write(memoryview(lines.buffers()[2])[offsets[0]:offsets[-1]])
+    elif output_format == "delta":
+        reader = pa.RecordBatchReader.from_batches(
+            schema, (record_batch for batch in batches for record_batch in batch.to_batches())
+        )
+        writer_properties = WriterProperties(max_row_group_size=row_group_size) if row_group_size else None
+        write_deltalake(path, reader, mode="overwrite", partition_by=partition_by, writer_properties=writer_properties)
+    else:
+        raise ValueError(f"Formato desconocido: {output_format}")
+
+
+def write_fake_logs(n, path, output_format="text", chunk_size=CHUNK_SIZE, seed=SEED):
+    """
+    Escribe `n` líneas de log sintéticas por lotes.
+
+    Parámetros:
+    - output_format (str): "text" (lo que lee `log_parser.parse_log_file`), "parquet" o "delta",
+      estos dos con una columna 'log'.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    schema = pa.schema([("log", pa.string())])
+    batches = iter_chunks(lambda rows, seed, chunk, _: pa.table([fake_log_lines(rows, seed, chunk)], schema=schema),
+                          n, chunk_size, seed)
+    write_chunks(batches, schema, path, output_format)
+
+
+def write_fake_crimes(n, path, output_format="delta", chunk_size=CHUNK_SIZE, seed=SEED, months=CRIME_MONTHS):
+    """
+    Escribe `n` crímenes sintéticos por lotes; en Delta queda una tabla Bronze particionada
+    por mes y con row groups de `BRONZE_ROW_GROUP_SIZE` filas, igual a la que arma `write_bronze`.
+    """
+    batches = iter_chunks(lambda rows, seed, chunk, start: fake_crimes(rows, seed, chunk, months, start),
+                          n, chunk_size, seed)
+    write_chunks(batches, BRONZE_SCHEMA, path, output_format,
+                 partition_by=["month"] if output_format == "delta" else None, row_group_size=BRONZE_ROW_GROUP_SIZE)
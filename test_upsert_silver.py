@@ -0,0 +1,53 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from deltalake import DeltaTable, write_deltalake
+
+import ezequiel_nunzio_TP1 as pipeline
+from synthetic_data import CRIME_CATEGORIES, fake_crimes
+
+
+def test_keyless_crimes_with_identical_columns_survive_merge(tmp_path, monkeypatch):
+    # Las rutas del pipeline son relativas: todo se escribe dentro de tmp_path
+    monkeypatch.chdir(tmp_path)
+    categories = pd.DataFrame({"url": CRIME_CATEGORIES, "name": [url.title() for url in CRIME_CATEGORIES]})
+
+    write_deltalake(pipeline.BRONZE_PATH, fake_crimes(200, months=["2024-01"]), partition_by=["month"])
+    pipeline.upsert_silver(categories)
+
+    # Dos crímenes sin clave, iguales en todo salvo el `id` de Bronze
+    crimes = fake_crimes(200, months=["2024-02"], first_id=1_000)
+    crime = crimes.filter(pc.equal(crimes["category"], "anti-social-behaviour")).slice(0, 1)
+    twins = pa.concat_tables([crime, crime])
+    twins = twins.set_column(twins.schema.get_field_index("id"), "id", pa.array([5_000, 5_001], pa.int64()))
+    write_deltalake(pipeline.BRONZE_PATH, twins, mode="append", partition_by=["month"])
+    pipeline.upsert_silver(categories)
+
+    silver = DeltaTable(pipeline.SILVER_PATH).to_pyarrow_table()
+    february = silver.filter(pc.equal(pc.strftime(silver["crime_month"], format="%Y-%m"), "2024-02"))
+    assert february.num_rows == 2
+    assert silver.num_rows == pipeline.process_crime_data_arrow(categories).num_rows
+
+
+def test_compacting_bronze_does_not_count_as_new_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    categories = pd.DataFrame({"url": CRIME_CATEGORIES, "name": [url.title() for url in CRIME_CATEGORIES]})
+
+    # Tres archivos chicos por mes
+    for part in range(3):
+        crimes = fake_crimes(3_000, first_id=part * 3_000)
+        write_deltalake(pipeline.BRONZE_PATH, crimes, mode="append", partition_by=["month"])
+    pipeline.upsert_silver(categories)
+    consumed = pipeline.consumed_version()
+
+    DeltaTable(pipeline.BRONZE_PATH).optimize.compact()
+    rows, _ = pipeline.bronze_rows_since(consumed)
+    assert rows.num_rows == 0
+
+    # Filas nuevas de un mes, compactadas antes de llegar a Silver: solo se relee ese mes
+    crimes = fake_crimes(500, months=["2024-02"], first_id=9_000)
+    write_deltalake(pipeline.BRONZE_PATH, crimes, mode="append", partition_by=["month"])
+    DeltaTable(pipeline.BRONZE_PATH).optimize.compact()
+    rows, _ = pipeline.bronze_rows_since(consumed)
+    assert set(rows["month"].to_pylist()) == {"2024-02"}
+    assert pc.is_in(crimes["id"], rows["id"]).to_pylist() == [True] * crimes.num_rows